@@ -0,0 +1,36 @@
+"""add ivfflat index on medical code vectors
+
+Revision ID: a1c3f9d27e41
+Revises: 5e6551a52124
+Create Date: 2025-09-01 10:42:18.113902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3f9d27e41'
+down_revision: Union[str, None] = '5e6551a52124'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ICD-10 similarity search in find_similar_icd10_codes currently does a
+    # sequential scan over every medical_codes row, computing the L2 distance
+    # for each. An IVFFlat index clusters the vectors into lists (~sqrt(N) for
+    # our ~70k-code corpus) so a query only scans the nearest clusters —
+    # approximate, but more than accurate enough for a top-50 candidate pool
+    # that an LLM re-ranks afterwards.
+    op.execute(
+        "CREATE INDEX ix_medical_codes_vector_ivfflat ON medical_codes "
+        "USING ivfflat (vector vector_l2_ops) WITH (lists = 100)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP INDEX IF EXISTS ix_medical_codes_vector_ivfflat")
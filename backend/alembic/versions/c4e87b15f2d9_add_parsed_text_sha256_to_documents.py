@@ -0,0 +1,33 @@
+"""add parsed_text_sha256 to documents
+
+Revision ID: c4e87b15f2d9
+Revises: a1c3f9d27e41
+Create Date: 2025-09-01 14:07:51.620418
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e87b15f2d9'
+down_revision: Union[str, None] = 'a1c3f9d27e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Content hash of the document's file, filled in at parse time. Indexed so
+    # the parse path can look up whether an identical file has already been
+    # parsed for any patient and copy its parsed_text instead of re-submitting
+    # the file to LlamaParse.
+    op.add_column('documents', sa.Column('parsed_text_sha256', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_documents_parsed_text_sha256'), 'documents', ['parsed_text_sha256'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_documents_parsed_text_sha256'), table_name='documents')
+    op.drop_column('documents', 'parsed_text_sha256')
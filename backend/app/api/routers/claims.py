@@ -12,7 +12,6 @@ from app.tasks import process_claim_creation, process_adjudication
 from app.models.claim import ClaimStatus
 from app.utils.file_handling import save_upload_file
 from app.services import pdf_service
-import datetime
 from datetime import datetime, timezone
 
 router = APIRouter(
@@ -131,7 +130,7 @@ def list_claims(
         }
     },
 )
-def export_claim_as_cms1500(
+async def export_claim_as_cms1500(
     claim_id: uuid.UUID,
     db: Session = Depends(get_db)
 ):
@@ -147,7 +146,9 @@ def export_claim_as_cms1500(
     if db_claim is None:
         raise HTTPException(status_code=404, detail="Claim not found")
 
-    pdf_bytes = pdf_service.generate_claim_summary_pdf(db_claim)
+    # Rendering runs in a worker thread (and is cached per claim version) so
+    # it doesn't block the event loop.
+    pdf_bytes = await pdf_service.generate_cms1500_pdf_async(db_claim)
     
     return Response(
         content=pdf_bytes,
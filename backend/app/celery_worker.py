@@ -1,6 +1,10 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # This environment variable setup is a standard Celery convention.
 # It helps prevent circular imports when Celery discovers tasks.
 os.environ.setdefault('FORKED_BY_CELERY', '1')
@@ -20,4 +24,55 @@ celery_app = Celery(
 # Optional configuration to make tracking tasks easier.
 celery_app.conf.update(
     task_track_started=True,
-)
\ No newline at end of file
+    # Queue-per-workload routing so slow jobs can't head-of-line block fast
+    # ones and each class can be scaled independently:
+    #   - ocr: meriplex documents can spend minutes in OCR.
+    #   - claims: the multi-LLM claim pipeline and adjudication, each
+    #     10-60s of mostly network wait; a surge of claim uploads should not
+    #     delay policy ingestion (and vice versa).
+    # In dev a single worker consumes everything (-Q celery,claims,ocr); in
+    # production each queue can get its own worker, sized (and pooled) for
+    # that workload independently.
+    task_routes={
+        "app.tasks.process_meriplex_document": {"queue": "ocr"},
+        "app.tasks.process_claim_creation": {"queue": "claims"},
+        "app.tasks.process_adjudication": {"queue": "claims"},
+    },
+)
+
+
+# Registered for both signals so the warm-up runs regardless of pool type:
+# worker_init fires once in the main process (threads/solo pools),
+# worker_process_init fires in each prefork child.
+@worker_init.connect
+@worker_process_init.connect
+def _prewarm_clients(**kwargs):
+    """
+    Pays the cold-start costs at worker boot instead of on the first task:
+    imports app.tasks (building the LLM/parse client singletons, prompt
+    constants, and compiled validators), checks out one DB connection to
+    prime the pool, and opens a throwaway TLS connection to Azure so DNS is
+    cached and a TLS session ticket exists before the first real LLM call.
+
+    The shared AsyncAzureOpenAI client is deliberately NOT exercised here:
+    its connections would be bound to a warm-up event loop that no task
+    thread ever runs, so they'd be dead weight in the pool.
+    """
+    import httpx
+
+    import app.tasks  # noqa: F401  (imports build the module-level clients)
+    from app.core.config import settings
+    from app.db.session import engine
+
+    try:
+        with engine.connect():
+            pass
+    except Exception as e:
+        logger.warning(f"DB pool pre-warm failed: {e}")
+
+    if settings.AZURE_OPENAI_ENDPOINT:
+        try:
+            with httpx.Client(timeout=5.0) as client:
+                client.get(settings.AZURE_OPENAI_ENDPOINT)
+        except Exception as e:
+            logger.warning(f"Azure endpoint pre-warm failed: {e}")
\ No newline at end of file
@@ -24,6 +24,17 @@ class Settings(BaseSettings):
     # --- MISTRAL AI (For OrthoPilot) ---
     MISTRAL_API_KEY: Optional[str] = None
 
+    # --- LLM RESPONSE CACHING ---
+    # Serve cached LLM responses for exact or near-duplicate prompts.
+    # Off by default: a semantic hit returns a response generated for a
+    # *similar* prompt, which is a deliberate accuracy/cost trade-off.
+    LLM_SEMANTIC_CACHE_ENABLED: bool = False
+
+    # --- PDF RENDERING ---
+    # Temporary escape hatch while the ReportLab claim summary beds in:
+    # set to True to fall back to the legacy WeasyPrint renderer.
+    USE_WEASYPRINT_CLAIM_SUMMARY: bool = False
+
     # --- OPENAI DIRECT (For OrthoPilot) ---
     OPENAI_API_KEY: Optional[str] = None
     OPENAI_LLM_MODEL: Optional[str] = "gpt-5-2025-08-07"
@@ -1,6 +1,7 @@
 import uuid
 import logging
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import Optional, List
 
 from app import models, schemas
@@ -13,20 +14,26 @@ def get_claim(db: Session, claim_id: uuid.UUID) -> Optional[models.Claim]:
     """
     Retrieves a single claim by its ID, eagerly loading related documents and patient info.
     """
+    # Collections load via selectinload: two joinedload'd collections would
+    # multiply into a cartesian row set, and selectin keeps it at one extra
+    # query per collection with no duplicate-row hydration.
     return db.query(models.Claim).options(
-        joinedload(models.Claim.documents),
-        joinedload(models.Claim.patient).joinedload(models.Patient.documents)
+        selectinload(models.Claim.documents),
+        joinedload(models.Claim.patient).selectinload(models.Patient.documents)
     ).filter(models.Claim.id == claim_id).first()
 
 # --- NEW: A more comprehensive GET for adjudication ---
 def get_claim_for_adjudication(db: Session, claim_id: uuid.UUID) -> Optional[models.Claim]:
     """
-    Retrieves a single claim by its ID, eagerly loading all relationships
-    needed for the adjudication process.
+    Retrieves a single claim by its ID, eagerly loading only the relationships
+    the adjudication process serializes: the patient (for the name) and the
+    service lines. The patient's documents are deliberately not loaded — the
+    policy document is fetched separately by purpose, and hydrating every
+    unrelated document (with its parsed text) per adjudication is wasted I/O.
     """
     return db.query(models.Claim).options(
-        joinedload(models.Claim.patient).joinedload(models.Patient.documents),
-        joinedload(models.Claim.service_lines)
+        joinedload(models.Claim.patient),
+        selectinload(models.Claim.service_lines)
     ).filter(models.Claim.id == claim_id).first()
 
 def get_claims(db: Session, skip: int = 0, limit: int = 100) -> List[models.Claim]:
@@ -148,13 +155,11 @@ def update_claim_adjudication(db: Session, claim_id: uuid.UUID, update_data: dic
     db.refresh(db_claim)
     return db_claim
 
-def create_service_lines_for_claim(db: Session, claim_id: uuid.UUID, validated_codes: dict, confidence_scores: dict, diagnosis_pointers: dict, extracted_claim_data: dict):
+def _build_service_line_rows(claim_id: uuid.UUID, validated_codes: dict, confidence_scores: dict, diagnosis_pointers: dict, extracted_claim_data: dict) -> List[dict]:
     """
-    Creates service line records for a claim, including all codes, dynamically extracted charges, and pointers.
-    (THE ACTUAL FINAL VERSION)
+    Assembles the service-line insert rows for a claim from the validated
+    codes, dynamically extracted charges, and pointers.
     """
-    db.query(models.ServiceLine).filter(models.ServiceLine.claim_id == claim_id).delete()
-
     service_lines_to_add = []
     final_icd10_codes = [item['code'] for item in validated_codes.get('icd10_codes', [])]
     
@@ -183,21 +188,64 @@ def create_service_lines_for_claim(db: Session, claim_id: uuid.UUID, validated_c
         # --- MODIFIED CHARGE LOGIC ---
         # Prioritize the distributed charge. Fallback to the charge_map if distribution isn't possible.
         charge_amount = charge_to_distribute if charge_to_distribute > 0 else charge_map.get(cpt_code, 0.0)
-        
-        sl = models.ServiceLine(
-            claim_id=claim_id,
-            cpt_code=cpt_code,
-            icd10_codes=final_icd10_codes,
-            charge=charge_amount, # Use the calculated charge
-            code_confidence_score=confidence_scores.get(cpt_code),
-            diagnosis_pointer=diagnosis_pointers.get(cpt_code, "A")
-        )
-        service_lines_to_add.append(sl)
+
+        service_lines_to_add.append({
+            "claim_id": claim_id,
+            "cpt_code": cpt_code,
+            "icd10_codes": final_icd10_codes,
+            "charge": charge_amount, # Use the calculated charge
+            "code_confidence_score": confidence_scores.get(cpt_code),
+            "diagnosis_pointer": diagnosis_pointers.get(cpt_code, "A"),
+        })
+
+    return service_lines_to_add
+
+def create_service_lines_for_claim(db: Session, claim_id: uuid.UUID, validated_codes: dict, confidence_scores: dict, diagnosis_pointers: dict, extracted_claim_data: dict):
+    """
+    Creates service line records for a claim, including all codes, dynamically extracted charges, and pointers.
+    (THE ACTUAL FINAL VERSION)
+    """
+    db.query(models.ServiceLine).filter(models.ServiceLine.claim_id == claim_id).delete()
+
+    service_lines_to_add = _build_service_line_rows(
+        claim_id, validated_codes, confidence_scores, diagnosis_pointers, extracted_claim_data
+    )
 
     if service_lines_to_add:
-        db.bulk_save_objects(service_lines_to_add)
+        # Single executemany INSERT: one round-trip for all lines instead of
+        # a statement per service line.
+        db.execute(insert(models.ServiceLine), service_lines_to_add)
         db.commit()
 
+def finalize_claim_processing(db: Session, claim: models.Claim, claim_in: schemas.ClaimUpdate, validated_codes: dict, confidence_scores: dict, diagnosis_pointers: dict, extracted_claim_data: dict) -> models.Claim:
+    """
+    Applies all results of claim processing in ONE transaction: the field
+    updates from extraction, the replacement service lines, and the status
+    flip to draft. The previous flow ran three CRUD functions that each
+    re-fetched the claim and committed separately (with the first commit's
+    service lines immediately deleted by the second call).
+    """
+    update_data = claim_in.model_dump(exclude_unset=True)
+    # Service lines are rebuilt below from the validated codes; the ones on
+    # the update schema (raw extraction output) would only be thrown away.
+    update_data.pop('service_lines', None)
+
+    for field, value in update_data.items():
+        setattr(claim, field, value)
+    claim.status = models.ClaimStatus.draft
+    db.add(claim)
+
+    db.query(models.ServiceLine).filter(models.ServiceLine.claim_id == claim.id).delete(synchronize_session=False)
+    service_lines_to_add = _build_service_line_rows(
+        claim.id, validated_codes, confidence_scores, diagnosis_pointers, extracted_claim_data
+    )
+    if service_lines_to_add:
+        db.execute(insert(models.ServiceLine), service_lines_to_add)
+
+    db.commit()
+    db.refresh(claim)
+    return claim
+
 def delete_claim(db: Session, claim_id: uuid.UUID) -> Optional[models.Claim]:
     """
     Deletes a claim and its associated data.
@@ -49,31 +49,45 @@ def validate_codes(db: Session, suggested_codes: Dict[str, List[str]]) -> Dict[s
             
     return validated_output
 
+# Cap on how many search terms we embed and rank against. The LLM rarely
+# produces more, and each extra term adds a distance expression to the query.
+_MAX_SEARCH_TERMS = 8
+
 def find_similar_icd10_codes(db: Session, search_terms: List[str]) -> List[Dict[str, str]]:
     """
     Finds the most semantically similar ICD-10 codes using vector search.
+
+    Every search term is embedded separately (in one batched API call) and
+    candidates are ranked by their distance to the *closest* term, so distinct
+    diagnoses are matched individually instead of being diluted into a single
+    averaged query embedding. One SQL round-trip regardless of term count.
     """
     if not search_terms:
         return []
 
-    query_text = " ".join(search_terms)
-    
+    # Drop duplicate terms (order-preserving) before spending the cap on them:
+    # the LLM occasionally repeats a diagnosis phrase, and a duplicate buys
+    # nothing but an extra embedding and distance expression.
+    terms = list(dict.fromkeys(search_terms))[:_MAX_SEARCH_TERMS]
+
     try:
-        query_vector = get_embeddings([query_text])[0]
+        query_vectors = get_embeddings(terms)
     except Exception as e:
-        logger.error(f"Could not get embedding for query text: {e}")
+        logger.error(f"Could not get embeddings for search terms: {e}")
         return []
 
-    if not query_vector:
-        logger.warning("Embedding service returned no vector for the query text.")
+    query_vectors = [vector for vector in query_vectors if vector]
+    if not query_vectors:
+        logger.warning("Embedding service returned no vectors for the search terms.")
         return []
 
-    # --- THE FIX IS HERE ---
-    # We access the distance function directly from the model's Vector column.
+    distances = [MedicalCode.vector.l2_distance(vector) for vector in query_vectors]
+    best_distance = distances[0] if len(distances) == 1 else func.least(*distances)
+
     results = db.query(MedicalCode).filter(
         MedicalCode.code_type == 'ICD-10'
     ).order_by(
-        MedicalCode.vector.l2_distance(query_vector) # <-- This is the new, correct way
+        best_distance
     ).limit(50).all()
 
     logger.info(f"Found {len(results)} similar ICD-10 candidates via vector search.")
@@ -1,4 +1,5 @@
 import uuid
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Tuple
 
@@ -10,20 +11,22 @@ def create_benefits_for_patient(db: Session, patient_id: uuid.UUID, source_docum
     """
     # First, clear any old benefits from the same source document to prevent duplicates on re-runs
     db.query(models.PolicyBenefit).filter(models.PolicyBenefit.source_document_id == source_document_id).delete()
-    
-    new_benefits = []
-    for benefit_dict in benefits_data:
-        benefit = models.PolicyBenefit(
-            patient_id=patient_id,
-            source_document_id=source_document_id,
-            benefit_type=benefit_dict.get('benefit_type'),
-            is_covered=benefit_dict.get('is_covered', False),
-            co_pay_amount=benefit_dict.get('co_pay_amount'),
-            coverage_percent=benefit_dict.get('coverage_percent')
-        )
-        new_benefits.append(benefit)
-        
-    db.bulk_save_objects(new_benefits)
+
+    # One executemany INSERT for the whole batch — a single round-trip
+    # instead of a statement per benefit row.
+    new_benefits = [
+        {
+            "patient_id": patient_id,
+            "source_document_id": source_document_id,
+            "benefit_type": benefit_dict.get('benefit_type'),
+            "is_covered": benefit_dict.get('is_covered', False),
+            "co_pay_amount": benefit_dict.get('co_pay_amount'),
+            "coverage_percent": benefit_dict.get('coverage_percent'),
+        }
+        for benefit_dict in benefits_data
+    ]
+    if new_benefits:
+        db.execute(insert(models.PolicyBenefit), new_benefits)
     db.commit()
     return new_benefits
 
@@ -42,13 +42,20 @@ async def startup_event():
     # --- MODIFIED ---
     # Replace the old doc_intelligence_service with our new parsing_service
     from app.services import llm_service, parsing_service
-    if not llm_service.azure_llm_client:
+    if not llm_service.llm_configured:
         logger.warning("Azure LLM Client could not be initialized. AI features will be unavailable.")
     # Check if the LlamaParse API key is set
     if not parsing_service.settings.LLAMAPARSE_API_KEY:
         logger.warning("LlamaParse API key is not configured. Document parsing will be unavailable.")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("RevClarity API shutting down...")
+    from app.services import parsing_service
+    await parsing_service.close_http_client()
+
+
 @app.get("/", tags=["Root"])
 async def read_root():
     return {"message": "Welcome to the RevClarity API. We are live."}
\ No newline at end of file
@@ -23,6 +23,11 @@ class Document(Base):
     document_purpose = Column(String(50))
     
     parsed_text = Column(Text, nullable=True)
+    # --- NEW ---
+    # SHA-256 of the underlying file's bytes, set when the document is parsed.
+    # Lets us reuse parsed_text across documents that reference identical
+    # files (e.g. the same insurer master policy uploaded for many patients).
+    parsed_text_sha256 = Column(String(64), nullable=True, index=True)
     uploaded_at = Column(DateTime, default=datetime.utcnow)
 
     claim = relationship("Claim", back_populates="documents")
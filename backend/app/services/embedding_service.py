@@ -1,16 +1,19 @@
 import logging
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 from app.core.config import settings
 from typing import List, Optional
 
 logger = logging.getLogger(__name__)
 
-# Initialize a synchronous client for the utility script
+# Initialize a synchronous client for the utility script, plus an async
+# twin for callers that fan several embedding requests out concurrently.
 client: Optional[OpenAI] = None
+async_client: Optional[AsyncOpenAI] = None
 
 if settings.OPENAI_API_KEY:
     try:
         client = OpenAI(api_key=settings.OPENAI_API_KEY)
+        async_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         logger.info("Direct OpenAI Embedding client initialized.")
     except Exception as e:
         logger.error(f"Failed to initialize direct OpenAI Embedding client: {e}", exc_info=True)
@@ -28,6 +31,24 @@ def get_embeddings(texts: List[str]) -> List[List[float]]:
             model=settings.OPENAI_EMBEDDING_MODEL
         )
         return [item.embedding for item in response.data]
+    except Exception as e:
+        logger.error(f"Failed to get embeddings from OpenAI: {e}", exc_info=True)
+        return [[] for _ in texts]
+
+
+async def get_embeddings_async(texts: List[str]) -> List[List[float]]:
+    """Async variant of get_embeddings with the same failure semantics."""
+    if not async_client:
+        raise ConnectionError("Embedding client is not initialized.")
+    if not texts:
+        return []
+
+    try:
+        response = await async_client.embeddings.create(
+            input=texts,
+            model=settings.OPENAI_EMBEDDING_MODEL
+        )
+        return [item.embedding for item in response.data]
     except Exception as e:
         logger.error(f"Failed to get embeddings from OpenAI: {e}", exc_info=True)
         return [[] for _ in texts]
\ No newline at end of file
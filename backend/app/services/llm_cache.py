@@ -0,0 +1,143 @@
+import asyncio
+import functools
+import hashlib
+import logging
+
+import numpy as np
+import orjson
+import redis
+
+from app.core.config import settings
+from app.services.embedding_service import get_embeddings
+
+logger = logging.getLogger(__name__)
+
+# Two-level cache for LLM responses, stored in Redis:
+#
+#   L1 — exact match: SHA-256 of the full prompt text. Free to check, hits
+#        whenever the very same documents are re-processed.
+#   L2 — semantic match: the prompt is embedded and compared (cosine) against
+#        the most recent entries in the same namespace; a near-duplicate
+#        prompt (e.g. the same policy template for a different patient)
+#        returns the cached JSON without an LLM round-trip.
+#
+# Disabled by default (settings.LLM_SEMANTIC_CACHE_ENABLED) because serving a
+# merely-similar response is a correctness trade-off that should be an
+# explicit operational decision.
+
+# Version tag folded into every cache key. Bump when a prompt's semantics
+# change in a way its text doesn't capture (model upgrades, tool schemas,
+# post-processing changes) so stale responses age out instead of being
+# served against the new pipeline.
+PROMPT_VERSION = "v2"
+
+SIMILARITY_THRESHOLD = 0.92
+CACHE_TTL_SECONDS = 24 * 3600
+# How many recent entries per namespace the L2 lookup scans. Keeps lookup
+# cost bounded; older entries age out of consideration (and out of Redis).
+_SCAN_LIMIT = 128
+# Long documents are truncated for the embedding call only; similarity on the
+# first few thousand characters is plenty to recognize a near-duplicate.
+_EMBED_MAX_CHARS = 8000
+
+_redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+
+def _prompt_hash(prompt_text: str) -> str:
+    return hashlib.sha256(prompt_text.encode("utf-8")).hexdigest()
+
+
+def _cosine_similarities(query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    query = query / (np.linalg.norm(query) or 1.0)
+    norms = np.linalg.norm(matrix, axis=1)
+    norms[norms == 0] = 1.0
+    return (matrix / norms[:, None]) @ query
+
+
+def _lookup(namespace: str, prompt_text: str):
+    """Returns (cache status, cached response or None, embedding or None)."""
+    exact_key = f"llmcache:exact:{namespace}:{PROMPT_VERSION}:{_prompt_hash(prompt_text)}"
+    try:
+        cached = _redis_client.get(exact_key)
+    except redis.RedisError as e:
+        logger.warning(f"LLM cache unavailable ({e}); calling through.")
+        return "error", None, None
+    if cached is not None:
+        return "hit-exact", orjson.loads(cached), None
+
+    try:
+        embedding = get_embeddings([prompt_text[:_EMBED_MAX_CHARS]])[0]
+    except Exception as e:
+        logger.warning(f"LLM cache embedding failed ({e}); calling through.")
+        return "error", None, None
+    if not embedding:
+        return "error", None, None
+    query = np.asarray(embedding, dtype=np.float32)
+
+    try:
+        entries = _redis_client.lrange(f"llmcache:sem:{namespace}:{PROMPT_VERSION}", 0, _SCAN_LIMIT - 1)
+    except redis.RedisError as e:
+        logger.warning(f"LLM cache unavailable ({e}); calling through.")
+        return "error", None, embedding
+
+    if entries:
+        decoded = [orjson.loads(entry) for entry in entries]
+        matrix = np.asarray([entry["embedding"] for entry in decoded], dtype=np.float32)
+        similarities = _cosine_similarities(query, matrix)
+        best = int(np.argmax(similarities))
+        if similarities[best] >= SIMILARITY_THRESHOLD:
+            logger.info(
+                f"LLM cache semantic hit in '{namespace}' (similarity={similarities[best]:.3f})."
+            )
+            return "hit-semantic", decoded[best]["response"], embedding
+
+    return "miss", None, embedding
+
+
+def _store(namespace: str, prompt_text: str, embedding, response):
+    payload = orjson.dumps(response)
+    try:
+        exact_key = f"llmcache:exact:{namespace}:{PROMPT_VERSION}:{_prompt_hash(prompt_text)}"
+        _redis_client.setex(exact_key, CACHE_TTL_SECONDS, payload)
+        if embedding:
+            sem_key = f"llmcache:sem:{namespace}:{PROMPT_VERSION}"
+            _redis_client.lpush(
+                sem_key, orjson.dumps({"embedding": embedding, "response": response})
+            )
+            _redis_client.ltrim(sem_key, 0, _SCAN_LIMIT - 1)
+            _redis_client.expire(sem_key, CACHE_TTL_SECONDS)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store LLM cache entry ({e}).")
+
+
+def semantic_cache(namespace: str):
+    """
+    Decorator for async LLM functions: caches their JSON-serializable result
+    keyed by the stringified arguments, with exact-then-semantic lookup.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not settings.LLM_SEMANTIC_CACHE_ENABLED:
+                return await func(*args, **kwargs)
+
+            prompt_parts = [str(arg) for arg in args]
+            prompt_parts += [f"{k}={v}" for k, v in sorted(kwargs.items())]
+            prompt_text = "\n".join(prompt_parts)
+
+            status, cached, embedding = await asyncio.to_thread(
+                _lookup, namespace, prompt_text
+            )
+            logger.info(f"LLM cache status for '{namespace}': {status}")
+            if cached is not None:
+                return cached
+
+            response = await func(*args, **kwargs)
+            if status != "error":
+                await asyncio.to_thread(_store, namespace, prompt_text, embedding, response)
+            return response
+
+        return wrapper
+
+    return decorator
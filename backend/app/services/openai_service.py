@@ -1,19 +1,55 @@
 #backend/app/services/openai_service.py
 import logging
-import json
 import asyncio
-from openai import AsyncOpenAI, RateLimitError
+import os
+import re
+import httpx
+import numpy as np
+import orjson
+from openai import AsyncOpenAI
 from app.core.config import settings
-from typing import Optional, Dict, Any
+from typing import Optional, List, Dict, Any
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# --- Cheap embedding-based pre-classifier ---
+# Label order must match the rows of the centroid matrix produced by
+# scripts/build_classifier_centroids.py.
+CLASSIFICATION_LABELS = ["REFERRAL_FAX", "MODMED_NOTE", "DICTATED_NOTE", "NON_REFERRAL"]
+CLASSIFIER_EMBEDDING_MODEL = "text-embedding-3-small"
+# Below this cosine similarity we don't trust the centroid match and fall
+# back to the (much more expensive) LLM classifier.
+CLASSIFIER_CONFIDENCE_THRESHOLD = 0.35
+
+_CENTROIDS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "classifier_centroids.npy"
+)
+_classifier_centroids: Optional[np.ndarray] = None
+if os.path.exists(_CENTROIDS_PATH):
+    try:
+        centroids = np.load(_CENTROIDS_PATH)
+        # Normalize rows once so runtime classification is a single dot product.
+        _classifier_centroids = centroids / np.linalg.norm(centroids, axis=1, keepdims=True)
+        logger.info(f"Loaded {_classifier_centroids.shape[0]} classifier centroids from {_CENTROIDS_PATH}.")
+    except Exception as e:
+        logger.error(f"Failed to load classifier centroids: {e}", exc_info=True)
+else:
+    logger.info("No classifier centroids found; document classification will use the LLM path only.")
+
 client: Optional[AsyncOpenAI] = None
 
 if settings.OPENAI_API_KEY:
     try:
-        client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        # Let the SDK handle rate-limit recovery: it retries with exponential
+        # backoff and respects the server's Retry-After header, which is
+        # smarter than a fixed app-level sleep.
+        client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY,
+            max_retries=5,
+            timeout=httpx.Timeout(120.0, connect=10.0),
+        )
         logger.info("Direct OpenAI Async client initialized successfully.")
     except Exception as e:
         logger.error(f"Failed to initialize direct OpenAI client: {e}", exc_info=True)
@@ -21,69 +57,75 @@ else:
     logger.warning("OpenAI API key is not configured. OrthoPilot AI features will be unavailable.")
 
 async def call_llm_with_reasoning(
-    instructions: str, 
+    instructions: str,
     user_input: str,
     reasoning_effort: str = "low",
-    is_json: bool = False,
-    retries: int = 1,
-    retry_delay_seconds: int = 15
+    is_json: bool = False
 ) -> Dict[str, Any]:
     """
-    Central helper function to call the new OpenAI Responses API, controlling reasoning effort
-    and including a simple retry mechanism for rate limit errors.
+    Central helper function to call the new OpenAI Responses API, controlling reasoning effort.
+    Rate-limit retries are handled by the SDK itself (see client init above).
     """
     if not client:
         raise ConnectionError("OpenAI Client is not initialized.")
 
-    last_exception = None
-    for attempt in range(retries + 1):
-        try:
-            response_format = {"type": "json_object"} if is_json else {"type": "text"}
-            
-            messages = [
-                {"role": "system", "content": instructions},
-                {"role": "user", "content": user_input}
-            ]
-            
-            response = await client.responses.create(
-                model=settings.OPENAI_LLM_MODEL,
-                input=messages,
-                reasoning={"effort": reasoning_effort},
-                text={"format": response_format}
-            )
-            
-            response_content = response.output_text
-            if not response_content:
-                 raise ValueError("OpenAI API returned an empty response.")
-
-            if is_json:
-                return json.loads(response_content)
-            else:
-                return {"answer": response_content}
-        
-        # --- THE FIX: Catch RateLimitError and wait ---
-        except RateLimitError as e:
-            last_exception = e
-            if attempt < retries:
-                logger.warning(f"OpenAI rate limit hit. Retrying in {retry_delay_seconds} seconds... (Attempt {attempt + 1}/{retries + 1})")
-                await asyncio.sleep(retry_delay_seconds)
-            else:
-                logger.error("OpenAI rate limit hit. Max retries reached.")
-                raise e
-        except Exception as e:
-            logger.error(f"OpenAI API call failed: {e}", exc_info=True)
-            raise
+    try:
+        # Stream the response so transfer overlaps generation instead of
+        # waiting for the full completion server-side before the first byte.
+        chunks = []
+        async for delta in call_llm_with_reasoning_stream(instructions, user_input, reasoning_effort, is_json):
+            chunks.append(delta)
+
+        # Check the chunk list before joining: no allocation or truthiness
+        # test on a potentially large response string.
+        if not chunks:
+            raise ValueError("OpenAI API returned an empty response.")
+
+        response_content = "".join(chunks)
+        if is_json:
+            return orjson.loads(response_content)
+        return {"answer": response_content}
 
-    # This part should not be reached if retries are exhausted, but as a fallback:
-    raise last_exception if last_exception else Exception("LLM call failed after all retries.")
+    except Exception as e:
+        logger.error(f"OpenAI API call failed: {e}", exc_info=True)
+        raise
 
 
-async def classify_document(text_content: str) -> Dict[str, str]:
+async def call_llm_with_reasoning_stream(
+    instructions: str,
+    user_input: str,
+    reasoning_effort: str = "low",
+    is_json: bool = False
+):
     """
-    Analyzes document text and classifies it into one of the predefined categories.
+    Async generator variant of call_llm_with_reasoning that yields output text
+    deltas as the model produces them. Callers that can render or parse
+    partial output (e.g. UI streaming) consume this directly; everyone else
+    goes through call_llm_with_reasoning, which joins the deltas.
     """
-    logger.info("AI Task: Classifying document with enhanced logic...")
-    instructions = """
+    if not client:
+        raise ConnectionError("OpenAI Client is not initialized.")
+
+    response_format = {"type": "json_object"} if is_json else {"type": "text"}
+
+    messages = [
+        {"role": "system", "content": instructions},
+        {"role": "user", "content": user_input}
+    ]
+
+    async with client.responses.stream(
+        model=settings.OPENAI_LLM_MODEL,
+        input=messages,
+        reasoning={"effort": reasoning_effort},
+        text={"format": response_format}
+    ) as stream:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+
+
+# Shared by the interactive classifier and the Batch API bulk classifier below.
+CLASSIFICATION_INSTRUCTIONS = """
     You are an expert document classifier for an orthopedic practice. Your primary goal is to achieve maximum accuracy by analyzing evidence within the document.
 
     Follow this two-step process:
@@ -110,15 +152,147 @@ async def classify_document(text_content: str) -> Dict[str, str]:
 
     **Your final output MUST be a valid JSON object with a single key "classification".**
     """
+
+# Unambiguous header signatures resolved without any API call at all. Checked
+# in order; first match wins. Kept deliberately conservative — anything not
+# obviously one type falls through to the centroid/LLM classifiers.
+PRECLASS_RULES = [
+    (re.compile(r"Reason for Referral", re.IGNORECASE), "REFERRAL_FAX"),
+    (re.compile(r"Referral (?:Order|Authorization)", re.IGNORECASE), "REFERRAL_FAX"),
+    (re.compile(r"OrthoSouth.*MRN", re.IGNORECASE | re.DOTALL), "MODMED_NOTE"),
+    (re.compile(r"HISTORY OF PRESENT ILLNESS.*ASSESSMENT AND PLAN", re.IGNORECASE | re.DOTALL), "DICTATED_NOTE"),
+]
+
+
+def _preclassify_document(text_content: str) -> Optional[str]:
+    """Returns a label when an unambiguous header signature matches, else None."""
+    head = text_content[:6000]
+    for pattern, label in PRECLASS_RULES:
+        if pattern.search(head):
+            return label
+    return None
+
+
+async def _classify_document_by_centroid(text_content: str) -> Optional[str]:
+    """
+    Nearest-centroid classification over a single cheap embedding call.
+    Returns a label, or None when the best match is below the confidence
+    threshold (caller should fall back to the LLM).
+    """
+    response = await client.embeddings.create(
+        model=CLASSIFIER_EMBEDDING_MODEL,
+        input=text_content[:4000]
+    )
+    embedding = np.asarray(response.data[0].embedding)
+    embedding = embedding / np.linalg.norm(embedding)
+
+    similarities = _classifier_centroids @ embedding
+    best_index = int(np.argmax(similarities))
+    best_score = float(similarities[best_index])
+    if best_score < CLASSIFIER_CONFIDENCE_THRESHOLD:
+        logger.info(f"Centroid classifier unsure (best cosine {best_score:.2f}); deferring to LLM.")
+        return None
+    return CLASSIFICATION_LABELS[best_index]
+
+
+async def classify_document(text_content: str) -> Dict[str, str]:
+    """
+    Analyzes document text and classifies it into one of the predefined categories.
+    Cheapest checks run first: regex header signatures (no API call), then the
+    embedding+nearest-centroid classifier; only ambiguous documents go to the LLM.
+    """
+    preclassified = _preclassify_document(text_content)
+    if preclassified is not None:
+        logger.info(f"AI Task: Document classified as '{preclassified}' via header signature.")
+        return {"classification": preclassified}
+
+    if _classifier_centroids is not None:
+        try:
+            label = await _classify_document_by_centroid(text_content)
+            if label is not None:
+                logger.info(f"AI Task: Document classified as '{label}' via embedding centroids.")
+                return {"classification": label}
+        except Exception as e:
+            logger.warning(f"Centroid classification failed, falling back to LLM: {e}")
+
+    logger.info("AI Task: Classifying document with enhanced logic...")
     user_input = f"Please classify the following document content based on the strict rules and chain-of-thought process provided:\n\n---\n\n{text_content[:6000]}"
-    return await call_llm_with_reasoning(instructions, user_input, reasoning_effort="medium", is_json=True)
+    return await call_llm_with_reasoning(CLASSIFICATION_INSTRUCTIONS, user_input, reasoning_effort="medium", is_json=True)
 
-async def extract_referral_data(text_content: str) -> Dict[str, Any]:
+
+async def classify_documents_batch(
+    text_contents: list,
+    poll_interval_seconds: int = 30,
+    timeout_seconds: int = 24 * 60 * 60
+) -> Dict[str, str]:
     """
-    Extracts a comprehensive set of structured data from a referral fax document.
+    Classifies many documents via the OpenAI Batch API. Intended for
+    non-interactive ingestion runs: batched requests are ~50% cheaper and
+    do not count against our interactive rate limits, at the cost of up to
+    a 24h completion window.
+
+    Returns a dict mapping custom_id ('classify-<index>') to the
+    classification label. Interactive requests should keep using
+    classify_document.
     """
-    logger.info("AI Task: Performing comprehensive extraction on Referral Fax...")
-    instructions = """
+    if not client:
+        raise ConnectionError("OpenAI Client is not initialized.")
+
+    request_lines = []
+    for idx, text_content in enumerate(text_contents):
+        user_input = f"Please classify the following document content based on the strict rules and chain-of-thought process provided:\n\n---\n\n{text_content[:4000]}"
+        request_lines.append(orjson.dumps({
+            "custom_id": f"classify-{idx}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": settings.OPENAI_LLM_MODEL,
+                "messages": [
+                    {"role": "system", "content": CLASSIFICATION_INSTRUCTIONS},
+                    {"role": "user", "content": user_input}
+                ],
+                "response_format": {"type": "json_object"}
+            }
+        }).decode("utf-8"))
+
+    batch_file = await client.files.create(
+        file=("classification_batch.jsonl", "\n".join(request_lines).encode("utf-8")),
+        purpose="batch"
+    )
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"Submitted classification batch {batch.id} with {len(text_contents)} documents.")
+
+    deadline = asyncio.get_running_loop().time() + timeout_seconds
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        if asyncio.get_running_loop().time() > deadline:
+            raise TimeoutError(f"Classification batch {batch.id} did not complete within {timeout_seconds}s.")
+        await asyncio.sleep(poll_interval_seconds)
+        batch = await client.batches.retrieve(batch.id)
+
+    if batch.status != "completed":
+        raise RuntimeError(f"Classification batch {batch.id} ended with status '{batch.status}'.")
+
+    output_file = await client.files.content(batch.output_file_id)
+    classifications: Dict[str, str] = {}
+    for line in output_file.text.splitlines():
+        if not line.strip():
+            continue
+        record = orjson.loads(line)
+        try:
+            content = record["response"]["body"]["choices"][0]["message"]["content"]
+            classifications[record["custom_id"]] = orjson.loads(content).get("classification", "UNCLASSIFIED")
+        except (KeyError, IndexError, TypeError, orjson.JSONDecodeError):
+            logger.warning(f"Could not parse batch result for {record.get('custom_id')}.")
+            classifications[record.get("custom_id", "unknown")] = "UNCLASSIFIED"
+
+    logger.info(f"Classification batch {batch.id} completed with {len(classifications)} results.")
+    return classifications
+
+REFERRAL_EXTRACTION_INSTRUCTIONS = """
     You are a highly accurate medical data extraction AI for an orthopedic practice. Your task is to extract a comprehensive set of information from the provided text of a referral fax.
 
     You MUST return a JSON object with the following exact keys. If a value for any key cannot be found in the text, you MUST use `null`. Do not invent information. Pay close attention to formatting and the rules below.
@@ -150,15 +324,16 @@ async def extract_referral_data(text_content: str) -> Dict[str, Any]:
       "referral_date": "string"
     }
     """
-    user_input = f"Please extract the data from this referral text, following all rules carefully:\n\n---\n\n{text_content}"
-    return await call_llm_with_reasoning(instructions, user_input, reasoning_effort="low", is_json=True)
 
-async def extract_dictated_note_data(text_content: str) -> Dict[str, Any]:
+async def extract_referral_data(text_content: str) -> Dict[str, Any]:
     """
-    Performs a granular extraction of clinical data from a dictated visit note.
+    Extracts a comprehensive set of structured data from a referral fax document.
     """
-    logger.info("AI Task: Performing GRANULAR extraction on Dictated Note...")
-    instructions = """
+    logger.info("AI Task: Performing comprehensive extraction on Referral Fax...")
+    user_input = f"Please extract the data from this referral text, following all rules carefully:\n\n---\n\n{text_content}"
+    return await call_llm_with_reasoning(REFERRAL_EXTRACTION_INSTRUCTIONS, user_input, reasoning_effort="low", is_json=True)
+
+DICTATED_NOTE_INSTRUCTIONS = """
      You are a specialist AI trained in parsing clinical documentation. Your task is to perform a highly granular extraction of a physician's dictated note and structure it into a clean JSON object.
 
     Break down the 'Assessment and Plan' into discrete components: diagnoses, prescribed medications, recommended procedures, therapies, follow-up instructions, etc.
@@ -184,15 +359,16 @@ async def extract_dictated_note_data(text_content: str) -> Dict[str, Any]:
       }
     }
     """
-    user_input = f"Please extract the clinical data from this dictated note into the specified granular JSON format:\n\n---\n\n{text_content}"
-    return await call_llm_with_reasoning(instructions, user_input, reasoning_effort="low", is_json=True)
 
-async def generate_emr_actions(extracted_data: Dict[str, Any]) -> Dict[str, Any]:
+async def extract_dictated_note_data(text_content: str) -> Dict[str, Any]:
     """
-    Takes structured clinical data and generates a list of suggested EMR actions.
+    Performs a granular extraction of clinical data from a dictated visit note.
     """
-    logger.info("AI Task: Generating EMR actions from extracted data...")
-    instructions = """
+    logger.info("AI Task: Performing GRANULAR extraction on Dictated Note...")
+    user_input = f"Please extract the clinical data from this dictated note into the specified granular JSON format:\n\n---\n\n{text_content}"
+    return await call_llm_with_reasoning(DICTATED_NOTE_INSTRUCTIONS, user_input, reasoning_effort="low", is_json=True)
+
+EMR_ACTIONS_INSTRUCTIONS = """
     You are an AI RCM Co-pilot. Your task is to analyze a structured JSON object of extracted clinical data and generate a list of concrete, actionable tasks that an EMR system would perform. For each diagnosis, suggest a plausible ICD-10 code.
 
     Return a JSON object with a single key, "suggested_actions", which is an array of objects. Each object must have `type`, `summary`, and `details`.
@@ -223,17 +399,17 @@ async def generate_emr_actions(extracted_data: Dict[str, Any]) -> Dict[str, Any]
       ]
     }
     """
-    user_input = f"Based on the following extracted clinical data, generate the suggested EMR actions:\n\n{json.dumps(extracted_data, indent=2)}"
-    return await call_llm_with_reasoning(instructions, user_input, reasoning_effort="low", is_json=True)
 
-async def extract_modmed_note_data(text_content: str) -> Dict[str, Any]:
+async def generate_emr_actions(extracted_data: Dict[str, Any]) -> Dict[str, Any]:
     """
-    Performs an exhaustive, deeply nested extraction of all data points from a structured EMR note (ModMed/EMA).
+    Takes structured clinical data and generates a list of suggested EMR actions.
     """
-    logger.info("AI Task: Performing EXHAUSTIVE extraction on ModMed/EMA Note...")
-    
-    # --- THE FIX: This is the correct, single, detailed prompt ---
-    instructions = """
+    logger.info("AI Task: Generating EMR actions from extracted data...")
+    user_input = f"Based on the following extracted clinical data, generate the suggested EMR actions:\n\n{orjson.dumps(extracted_data, option=orjson.OPT_INDENT_2).decode()}"
+    return await call_llm_with_reasoning(EMR_ACTIONS_INSTRUCTIONS, user_input, reasoning_effort="low", is_json=True)
+
+# --- THE FIX: This is the correct, single, detailed prompt ---
+MODMED_SINGLE_SHOT_INSTRUCTIONS = """
     You are a world-class clinical data architect. Your task is to meticulously parse the text from an EMR visit note and transform it into a highly structured, deeply nested JSON object. Every single piece of information must be captured and categorized.
 
     **CRITICAL INSTRUCTIONS:**
@@ -314,7 +490,218 @@ async def extract_modmed_note_data(text_content: str) -> Dict[str, Any]:
       }
     }
     """
+
+async def _extract_modmed_note_single_shot(text_content: str) -> Dict[str, Any]:
+    """
+    Single-prompt fallback extraction of a full ModMed/EMA note. Used when the
+    note can't be split into sections for the map-reduce path.
+    """
     user_input = f"Please perform an exhaustive extraction on the following EMR note, adhering strictly to the provided JSON schema:\n\n---\n\n{text_content}"
-    
+
     # This complex task requires higher reasoning effort for accuracy.
-    return await call_llm_with_reasoning(instructions, user_input, reasoning_effort="medium", is_json=True)
\ No newline at end of file
+    return await call_llm_with_reasoning(MODMED_SINGLE_SHOT_INSTRUCTIONS, user_input, reasoning_effort="medium", is_json=True)
+
+
+# --- Map-reduce extraction for ModMed notes ---
+# Long notes are split at the Physical Exam and Impression/Assessment headings
+# into three sections, each extracted concurrently against a minimized
+# sub-schema. Smaller prompts run in parallel, so wall-clock latency drops to
+# roughly the slowest sub-call and per-call token counts stay well under TPM limits.
+
+_MODMED_PHYSICAL_EXAM_MARKER = re.compile(r"^#{0,6}\s*\**\s*Physical Exam", re.IGNORECASE | re.MULTILINE)
+_MODMED_IMPRESSION_MARKER = re.compile(r"^#{0,6}\s*\**\s*(?:Impression|Assessment)", re.IGNORECASE | re.MULTILINE)
+
+_MODMED_SUBPROMPT_TEMPLATE = """
+    You are a world-class clinical data architect. You will receive ONE SECTION of an EMR visit note.
+    Transform it into a structured JSON object matching the schema below exactly.
+
+    **CRITICAL INSTRUCTIONS:**
+    1.  **Be Exhaustive:** Capture every data point present in this section.
+    2.  **Maintain Structure:** Adhere strictly to the nested JSON schema provided below.
+    3.  **Handle Nulls:** If a field or an entire top-level key is not present in this section, use `null`.
+
+    **Required JSON Schema:**
+    %s
+    """
+
+_MODMED_HEADER_SCHEMA = """
+    {
+      "patient_demographics": {
+        "name": "string (LAST, FIRST)",
+        "pms_id": "string",
+        "mrn": "string",
+        "dob": "string (YYYY-MM-DD)",
+        "sex": "string",
+        "contact_info": "string"
+      },
+      "visit_details": {
+        "visit_date": "string (YYYY-MM-DD)",
+        "provider_name": "string",
+        "chief_complaint": "string"
+      },
+      "clinical_history": {
+        "allergies": ["string"],
+        "medications": ["string"],
+        "medical_history": ["string"],
+        "musculoskeletal_history": ["string"],
+        "surgical_history": ["string"],
+        "social_history": "string"
+      },
+      "vitals": {
+        "date": "string (YYYY-MM-DD)",
+        "time": "string (HH:MM)",
+        "taken_by": "string",
+        "height": "string",
+        "weight": "string",
+        "bmi": "number",
+        "bsa": "number"
+      }
+    }
+    """
+
+_MODMED_EXAM_SCHEMA = """
+    {
+      "physical_exam": {
+        "general_appearance": "string",
+        "orientation": "string",
+        "mood": "string",
+        "lumbosacral": {
+          "rom": "string",
+          "skin_inspection": "string",
+          "palpation_findings": "string",
+          "posture": "string"
+        },
+        "extremity_strength_and_tone": [
+            { "muscle_group": "string (e.g., Right Iliopsoas)", "strength": "string (e.g., 5/5)", "tone": "string" }
+        ],
+        "sensation_and_reflexes": {
+            "dermatomal_sensation": "string",
+            "peripheral_sensation": "string",
+            "reflexes": "string"
+        }
+      },
+      "tests_and_results": [
+        {
+          "test_type": "string (e.g., 'X-Ray Interpretation Lumbar Spine')",
+          "diagnosis": "string",
+          "findings": "string"
+        }
+      ]
+    }
+    """
+
+_MODMED_PLAN_SCHEMA = """
+    {
+      "impression_and_plan": [
+        {
+          "diagnosis": "string",
+          "associated_diagnoses": ["string"],
+          "plan_items": [
+            { "type": "string (e.g., 'Home Exercise Program', 'Counseling', 'Prescription')", "details": "string" }
+          ]
+        }
+      ],
+      "follow_up": {
+          "timeframe": "string",
+          "notes": "string"
+      }
+    }
+    """
+
+
+def _split_modmed_note(text_content: str) -> Optional[List[str]]:
+    """
+    Splits a ModMed note into [header/history, physical exam, impression/plan]
+    sections. Returns None when the expected headings can't be found.
+    """
+    exam_match = _MODMED_PHYSICAL_EXAM_MARKER.search(text_content)
+    if not exam_match:
+        return None
+    impression_match = _MODMED_IMPRESSION_MARKER.search(text_content, exam_match.end())
+    if not impression_match:
+        return None
+    return [
+        text_content[:exam_match.start()],
+        text_content[exam_match.start():impression_match.start()],
+        text_content[impression_match.start():],
+    ]
+
+
+async def extract_modmed_note_data(text_content: str) -> Dict[str, Any]:
+    """
+    Performs an exhaustive, deeply nested extraction of all data points from a structured EMR note (ModMed/EMA).
+    Splits the note by section and extracts each sub-schema concurrently; falls
+    back to a single exhaustive prompt when the section headings aren't found.
+    """
+    sections = _split_modmed_note(text_content)
+    if not sections:
+        logger.info("AI Task: ModMed note sections not detected; using single-shot extraction.")
+        return await _extract_modmed_note_single_shot(text_content)
+
+    logger.info("AI Task: Performing sectioned map-reduce extraction on ModMed/EMA Note...")
+    sub_schemas = [_MODMED_HEADER_SCHEMA, _MODMED_EXAM_SCHEMA, _MODMED_PLAN_SCHEMA]
+    calls = [
+        call_llm_with_reasoning(
+            _MODMED_SUBPROMPT_TEMPLATE % schema,
+            f"Please extract this section of the EMR note, adhering strictly to the provided JSON schema:\n\n---\n\n{section}",
+            reasoning_effort="medium",
+            is_json=True,
+        )
+        for schema, section in zip(sub_schemas, sections)
+    ]
+    partial_results = await asyncio.gather(*calls)
+
+    merged: Dict[str, Any] = {}
+    for partial in partial_results:
+        if isinstance(partial, dict):
+            merged.update(partial)
+    return merged
+
+
+# Cap concurrent documents so batch fan-out stays within OpenAI rate limits.
+_batch_semaphore = asyncio.Semaphore(20)
+
+async def process_document(text_content: str) -> Dict[str, Any]:
+    """
+    Orchestrates the full classify -> extract pipeline for a single document,
+    overlapping independent LLM calls with asyncio.gather.
+
+    The referral extraction is issued speculatively alongside classification
+    (referral faxes are the most common document type); its result is only
+    kept when the classification confirms it. Returns a dict with the
+    'classification' string plus whichever extraction keys apply.
+    """
+    classification_result, referral_data = await asyncio.gather(
+        classify_document(text_content),
+        extract_referral_data(text_content),
+    )
+    classification_str = classification_result.get("classification", "UNCLASSIFIED")
+
+    result: Dict[str, Any] = {"classification": classification_str}
+
+    if classification_str == "REFERRAL_FAX":
+        result["extracted_referral"] = referral_data
+
+    elif classification_str == "DICTATED_NOTE":
+        granular_note_data = await extract_dictated_note_data(text_content)
+        result["extracted_note"] = granular_note_data
+        # EMR action generation depends on the granular extraction, so it stays serial.
+        suggested_actions = await generate_emr_actions(granular_note_data)
+        result["suggested_actions"] = suggested_actions.get("suggested_actions", [])
+
+    elif classification_str == "MODMED_NOTE":
+        result["extracted_modmed_note"] = await extract_modmed_note_data(text_content)
+
+    return result
+
+
+async def process_documents_batch(text_contents: list) -> list:
+    """
+    Processes many documents concurrently, bounded by a shared semaphore so
+    the fan-out shares the client's connection pool without tripping rate limits.
+    """
+    async def _bounded(text: str) -> Dict[str, Any]:
+        async with _batch_semaphore:
+            return await process_document(text)
+
+    return await asyncio.gather(*[_bounded(text) for text in text_contents])
\ No newline at end of file
@@ -1,9 +1,20 @@
+import asyncio
+import io
 import logging
+from collections import OrderedDict
 from jinja2 import Environment, FileSystemLoader
 from weasyprint import HTML
+from reportlab.pdfgen import canvas
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 import os
 
 from app import models
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -11,23 +22,290 @@ logger = logging.getLogger(__name__)
 template_dir = os.path.join(os.path.dirname(__file__), 'templates')
 jinja_env = Environment(loader=FileSystemLoader(template_dir))
 
+# Pre-decode the CMS-1500 form background once at import. ImageReader keeps
+# the decoded image in memory, so per-request renders skip the file open and
+# PNG decode entirely.
+_CMS_TEMPLATE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "cms_1500_template.png"
+)
+try:
+    _CMS_TEMPLATE = ImageReader(_CMS_TEMPLATE_PATH)
+except Exception as e:
+    logger.error(f"Failed to preload CMS-1500 template image: {e}", exc_info=True)
+    _CMS_TEMPLATE = None
+
+# Field positions on the CMS-1500 form, in inches from the bottom-left corner.
+# 'sl_y' lists the baselines of the six service-line rows in box 24.
+COORDS = {
+    "insured_id_number": (6.3, 9.55),
+    "patient_name": (0.3, 9.2),
+    "patient_dob": (3.2, 9.2),
+    "patient_sex": (4.4, 9.2),
+    "insured_name": (6.3, 9.2),
+    "patient_address": (0.3, 8.85),
+    "insured_address": (6.3, 8.85),
+    "patient_relationship_to_insured": (3.4, 8.85),
+    "insured_policy_group_or_feca_number": (6.3, 7.8),
+    "date_of_current_illness": (0.5, 7.0),
+    "referring_provider_name": (3.0, 7.0),
+    "referring_provider_npi": (3.0, 6.7),
+    "prior_authorization_number": (6.3, 6.05),
+    "diagnosis_code_slots": [(0.55, 6.25), (2.3, 6.25), (0.55, 5.95), (2.3, 5.95)],
+    "sl_y": [5.35, 5.02, 4.69, 4.36, 4.03, 3.7],
+    "sl_date_x": 0.35,
+    "sl_cpt_x": 2.45,
+    "sl_pointer_x": 4.2,
+    "sl_charge_x": 5.95,
+    "federal_tax_id_number": (0.3, 3.0),
+    "patient_account_no": (2.5, 3.0),
+    "accept_assignment": (4.35, 3.0),
+    "total_charge_amount": (5.95, 3.0),
+    "amount_paid_by_patient": (7.0, 3.0),
+    "service_facility_location_info": (2.4, 1.6),
+    "billing_provider_info": (5.0, 1.6),
+    "billing_provider_npi": (5.05, 0.95),
+}
+
+
+def _to_points(value):
+    if isinstance(value, tuple):
+        return tuple(v * inch for v in value)
+    if isinstance(value, list):
+        return [_to_points(v) for v in value]
+    return value * inch
+
+
+# Inch -> point conversion done once at import so renders don't repeat dozens
+# of float multiplications per PDF. COORDS stays in inches for readability.
+COORDS_PTS = {key: _to_points(value) for key, value in COORDS.items()}
+
+
+# Shared styles for the ReportLab claim summary, built once at import.
+_SUMMARY_STYLES = getSampleStyleSheet()
+_SUMMARY_TABLE_STYLE = TableStyle([
+    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#2c3e50")),
+    ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+    ("FONTSIZE", (0, 0), (-1, -1), 9),
+    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+    ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.HexColor("#f5f6fa")]),
+])
+
+
+def _render_error_pdf(message: str) -> bytes:
+    """One-page ReportLab error PDF — microseconds, vs re-running WeasyPrint."""
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    c.setFont("Helvetica-Bold", 14)
+    c.drawString(1 * inch, 10 * inch, "Error generating claim PDF")
+    c.setFont("Helvetica", 10)
+    c.drawString(1 * inch, 9.6 * inch, message)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+# Generic fallback built once at import; the degraded path should never have
+# to render anything expensive.
+_ERROR_PDF_BYTES = _render_error_pdf("Could not generate the requested claim PDF.")
+
+
+def _fmt_date(value) -> str:
+    return value.strftime("%m/%d/%Y") if value else ""
+
+
+def generate_cms1500_pdf(claim: models.Claim) -> bytes:
+    """
+    Draws the claim's fields onto the standard CMS-1500 form template and
+    returns the rendered PDF bytes.
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    if _CMS_TEMPLATE is not None:
+        c.drawImage(_CMS_TEMPLATE, 0, 0, width=width, height=height)
+
+    # All field text goes through one TextObject: a single text state block in
+    # the PDF content stream instead of per-field drawString state churn.
+    t = c.beginText()
+    t.setFont("Helvetica", 8)
+
+    def draw(x, y, text):
+        if text is None:
+            return
+        t.setTextOrigin(x, y)
+        t.textOut(str(text))
+
+    patient = claim.patient
+    patient_name = f"{patient.last_name}, {patient.first_name}" if patient else None
+
+    draw(*COORDS_PTS["insured_id_number"], claim.insured_id_number)
+    draw(*COORDS_PTS["patient_name"], patient_name)
+    draw(*COORDS_PTS["patient_dob"], _fmt_date(patient.date_of_birth) if patient else None)
+    draw(*COORDS_PTS["patient_sex"], claim.patient_sex)
+    draw(*COORDS_PTS["insured_name"], claim.insured_name)
+    draw(*COORDS_PTS["patient_address"], claim.patient_address)
+    draw(*COORDS_PTS["insured_address"], claim.insured_address)
+    draw(*COORDS_PTS["patient_relationship_to_insured"], claim.patient_relationship_to_insured)
+    draw(*COORDS_PTS["insured_policy_group_or_feca_number"], claim.insured_policy_group_or_feca_number)
+    draw(*COORDS_PTS["date_of_current_illness"], _fmt_date(claim.date_of_current_illness))
+    draw(*COORDS_PTS["referring_provider_name"], claim.referring_provider_name)
+    draw(*COORDS_PTS["referring_provider_npi"], claim.referring_provider_npi)
+    draw(*COORDS_PTS["prior_authorization_number"], claim.prior_authorization_number)
+    draw(*COORDS_PTS["federal_tax_id_number"], claim.federal_tax_id_number)
+    draw(*COORDS_PTS["patient_account_no"], claim.patient_account_no)
+    draw(*COORDS_PTS["accept_assignment"], "YES" if claim.accept_assignment else "NO")
+    draw(*COORDS_PTS["total_charge_amount"], f"{claim.total_charge_amount:.2f}" if claim.total_charge_amount is not None else None)
+    draw(*COORDS_PTS["amount_paid_by_patient"], f"{claim.amount_paid_by_patient:.2f}" if claim.amount_paid_by_patient is not None else None)
+    draw(*COORDS_PTS["service_facility_location_info"], claim.service_facility_location_info)
+    draw(*COORDS_PTS["billing_provider_info"], claim.billing_provider_info)
+    draw(*COORDS_PTS["billing_provider_npi"], claim.billing_provider_npi)
+
+    # Box 21: unique diagnosis codes collected from the service lines.
+    # Single order-preserving pass; no intermediate set/list/sort.
+    unique_icd_codes = list(dict.fromkeys(
+        code for sl in claim.service_lines for code in (sl.icd10_codes or [])
+    ))
+    for code, slot in zip(unique_icd_codes, COORDS_PTS["diagnosis_code_slots"]):
+        draw(slot[0], slot[1], code)
+
+    # Box 24: one row per service line, up to the six the form allows.
+    service_date = _fmt_date(claim.date_of_service)
+    for sl, y in zip(claim.service_lines, COORDS_PTS["sl_y"]):
+        draw(COORDS_PTS["sl_date_x"], y, service_date)
+        draw(COORDS_PTS["sl_cpt_x"], y, sl.cpt_code)
+        draw(COORDS_PTS["sl_pointer_x"], y, sl.diagnosis_pointer)
+        draw(COORDS_PTS["sl_charge_x"], y, f"{sl.charge:.2f}" if sl.charge is not None else None)
+
+    c.drawText(t)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+# Rendered-PDF cache keyed by (claim id, updated_at): repeated downloads of an
+# unchanged claim return the same bytes without re-rendering. Bounded LRU so
+# memory stays flat.
+_PDF_CACHE_MAX_ENTRIES = 256
+_pdf_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+
+async def _render_pdf_cached(kind: str, claim: models.Claim, render) -> bytes:
+    """
+    Serves repeated downloads of an unchanged claim from the cache and renders
+    cache misses in a worker thread so CPU-bound PDF work never blocks the
+    event loop.
+    """
+    cache_key = (kind, claim.id, claim.updated_at)
+    cached = _pdf_cache.get(cache_key)
+    if cached is not None:
+        _pdf_cache.move_to_end(cache_key)
+        return cached
+
+    pdf_bytes = await asyncio.to_thread(render, claim)
+
+    _pdf_cache[cache_key] = pdf_bytes
+    if len(_pdf_cache) > _PDF_CACHE_MAX_ENTRIES:
+        _pdf_cache.popitem(last=False)
+    return pdf_bytes
+
+
+async def generate_claim_summary_pdf_async(claim: models.Claim) -> bytes:
+    """Async entry point for the claim summary PDF (cached, off-loop render)."""
+    return await _render_pdf_cached("summary", claim, generate_claim_summary_pdf)
+
+
+async def generate_cms1500_pdf_async(claim: models.Claim) -> bytes:
+    """Async entry point for the CMS-1500 PDF (cached, off-loop render)."""
+    return await _render_pdf_cached("cms1500", claim, generate_cms1500_pdf)
+
 def generate_claim_summary_pdf(claim: models.Claim) -> bytes:
     """
-    Generates a professional claim summary PDF from an HTML template.
+    Generates a professional claim summary PDF. Renders with ReportLab by
+    default; the legacy WeasyPrint/HTML path stays available behind
+    USE_WEASYPRINT_CLAIM_SUMMARY while the new renderer beds in.
     """
+    if settings.USE_WEASYPRINT_CLAIM_SUMMARY:
+        return _generate_claim_summary_weasyprint(claim)
+    try:
+        return _generate_claim_summary_reportlab(claim)
+    except Exception as e:
+        logger.error(f"Failed to generate PDF for claim {claim.id}: {e}", exc_info=True)
+        try:
+            return _render_error_pdf(f"Could not generate PDF for claim {claim.id}.")
+        except Exception:
+            return _ERROR_PDF_BYTES
+
+
+def _generate_claim_summary_weasyprint(claim: models.Claim) -> bytes:
+    """Legacy HTML-template renderer (WeasyPrint)."""
     try:
         template = jinja_env.get_template("claim_export_template.html")
-        
+
         # Pass the claim and its related patient object to the template
         html_string = template.render(claim=claim, patient=claim.patient)
-        
+
         # Generate PDF from the rendered HTML
         pdf_bytes = HTML(string=html_string).write_pdf()
-        
+
         return pdf_bytes
-        
+
     except Exception as e:
         logger.error(f"Failed to generate PDF for claim {claim.id}: {e}", exc_info=True)
-        # Return a simple error PDF if generation fails
-        error_html = f"<h1>Error</h1><p>Could not generate PDF for claim {claim.id}.</p><p>Error: {e}</p>"
-        return HTML(string=error_html).write_pdf()
\ No newline at end of file
+        # Return a cheap error PDF instead of running WeasyPrint a second
+        # time on an already degraded path.
+        try:
+            return _render_error_pdf(f"Could not generate PDF for claim {claim.id}.")
+        except Exception:
+            return _ERROR_PDF_BYTES
+
+
+def _generate_claim_summary_reportlab(claim: models.Claim) -> bytes:
+    """
+    Renders the claim summary directly with ReportLab Platypus flowables,
+    skipping the HTML -> CSS -> Cairo pipeline entirely.
+    """
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, title=f"Claim Summary {claim.id}")
+    styles = _SUMMARY_STYLES
+
+    patient = claim.patient
+    patient_name = f"{patient.last_name}, {patient.first_name}" if patient else "N/A"
+
+    story = [
+        Paragraph("Claim Summary", styles["Title"]),
+        Paragraph(f"Claim ID: {claim.id}", styles["Normal"]),
+        Paragraph(f"Status: {claim.status.name if claim.status else 'N/A'}", styles["Normal"]),
+        Spacer(1, 12),
+        Paragraph("Patient", styles["Heading2"]),
+        Paragraph(f"Name: {patient_name}", styles["Normal"]),
+        Paragraph(f"Address: {claim.patient_address or 'N/A'}", styles["Normal"]),
+        Paragraph(f"Insured ID: {claim.insured_id_number or 'N/A'}", styles["Normal"]),
+        Paragraph(f"Payer: {claim.payer_name or 'N/A'}", styles["Normal"]),
+        Spacer(1, 12),
+        Paragraph("Service Lines", styles["Heading2"]),
+    ]
+
+    table_data = [["CPT Code", "Diagnosis Pointer", "ICD-10 Codes", "Charge"]]
+    for sl in claim.service_lines:
+        table_data.append([
+            sl.cpt_code or "",
+            sl.diagnosis_pointer or "",
+            ", ".join(sl.icd10_codes or []),
+            f"${sl.charge:.2f}" if sl.charge is not None else "",
+        ])
+    table = Table(table_data, hAlign="LEFT")
+    table.setStyle(_SUMMARY_TABLE_STYLE)
+    story.append(table)
+
+    story.append(Spacer(1, 12))
+    if claim.total_charge_amount is not None:
+        story.append(Paragraph(f"Total Charge: ${claim.total_charge_amount:.2f}", styles["Normal"]))
+    if claim.patient_responsibility_amount is not None:
+        story.append(Paragraph(f"Patient Responsibility: ${claim.patient_responsibility_amount:.2f}", styles["Normal"]))
+    if claim.payer_paid_amount is not None:
+        story.append(Paragraph(f"Payer Paid: ${claim.payer_paid_amount:.2f}", styles["Normal"]))
+
+    doc.build(story)
+    return buffer.getvalue()
\ No newline at end of file
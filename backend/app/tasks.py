@@ -2,10 +2,17 @@
 import logging
 from sqlalchemy.orm import Session
 import asyncio
+import hashlib
+import textwrap
+import threading
 import uuid
-import json
-import time # <-- Add this import at the top of your file
 
+import orjson
+import redis
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Optional
+
+from app.core.config import settings
 from app.db.session import SessionLocal
 from app import models, schemas
 from app.crud import crud_claim, crud_policy_benefit, crud_medical_code, crud_meriplex
@@ -13,89 +20,409 @@ from app.services import parsing_service, llm_service, openai_service, mistral_s
 from app.models.claim import ClaimStatus
 from app.models.meriplex_document import MeriplexDocumentStatus, MeriplexDocumentClassification
 from app.celery_worker import celery_app
-import datetime
 from datetime import datetime, timezone
 
 from app.services.embedding_service import get_embeddings
+from app.services.llm_cache import PROMPT_VERSION
 
 logger = logging.getLogger(__name__)
 
-# Helper function to run async code from a sync Celery task
-def run_async(func):
-    return asyncio.run(func)
+# Field names ClaimUpdate accepts, materialized once at import time so the
+# per-task filter over LLM-extracted data is a plain frozenset lookup.
+_CLAIM_UPDATE_FIELDS = frozenset(schemas.ClaimUpdate.model_fields)
+
+# Static system prompt for policy-benefit extraction, built once at import
+# time. Dedented so the exact bytes sent to Azure stay stable (prompt-cache
+# eligible) regardless of how this file is indented or reformatted.
+_POLICY_SYSTEM_PROMPT = textwrap.dedent("""
+    You are an expert Health Insurance Benefits Analyst. Your task is to read the provided policy document text
+    and extract a list of covered benefits. Return a JSON object with a single key "benefits".
+    The "benefits" key should hold an array of objects. Each object represents a single benefit and
+    MUST have these exact keys: 'benefit_type' (e.g., "Office Visit", "Specialist Visit", "Emergency Room"),
+    'is_covered' (boolean), 'co_pay_amount' (number), and 'coverage_percent' (number, e.g., 80 for 80%).
+    If a value isn't specified, use a reasonable default like null or 0.
+    Focus on common medical services.
+""").strip()
+
+class _ExtractedBenefit(BaseModel):
+    """Shape of one benefit object the Benefits Analyst prompt must return."""
+    benefit_type: str
+    is_covered: bool = False
+    co_pay_amount: Optional[float] = None
+    coverage_percent: Optional[float] = None
+
+# Compiled once at import time: validating the LLM's benefits output through
+# this adapter short-circuits malformed responses (and coerces numeric
+# strings) before any rows are written, instead of letting bad values reach
+# the INSERT and fail — or worse, land — there.
+_BENEFITS_VALIDATOR = TypeAdapter(List[_ExtractedBenefit])
+
+# Strict function schema for benefits extraction: with tool_choice forced to
+# this function, the provider constrains generation to the schema, so
+# malformed shapes are rejected server-side instead of surfacing as a
+# ValidationError and a retry on our end.
+_BENEFITS_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "emit_benefits",
+        "description": "Record the list of benefits extracted from the policy document.",
+        "strict": True,
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "benefits": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "benefit_type": {"type": "string"},
+                            "is_covered": {"type": "boolean"},
+                            "co_pay_amount": {"type": ["number", "null"]},
+                            "coverage_percent": {"type": ["number", "null"]},
+                        },
+                        "required": ["benefit_type", "is_covered", "co_pay_amount", "coverage_percent"],
+                        "additionalProperties": False,
+                    },
+                }
+            },
+            "required": ["benefits"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Helper to run async code from a sync Celery task.
+#
+# One event loop is kept alive per worker thread instead of asyncio.run()
+# spinning up (and tearing down) a fresh loop per call. This lets the async
+# HTTP clients (openai, httpx) keep their connection pools warm across tasks —
+# previously every task paid new TCP+TLS handshakes because the pools died
+# with the loop. The loop is thread-local so the worker can run with a
+# threaded pool (-P threads) where several tasks execute concurrently.
+_async_state = threading.local()
+
+def run_async(coro):
+    loop = getattr(_async_state, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _async_state.loop = loop
+    return loop.run_until_complete(coro)
+
+# Cross-claim cache of parsed markdown, keyed by the SHA-256 of the file
+# bytes. The per-document parsed_text column only helps the claim that parsed
+# the document; this Redis layer also catches the same file re-uploaded for a
+# different patient/claim, skipping the expensive LlamaParse round-trip.
+_PARSED_CACHE_TTL_SECONDS = 7 * 86400
+
+# How many LlamaParse uploads may be in flight at once per task.
+_PARSE_CONCURRENCY = 3
+_redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL, decode_responses=True)
+
+def _file_sha256(file_path: str) -> str:
+    """
+    Returns the hex SHA-256 digest of the file's contents. hashlib.file_digest
+    (3.11+) does the read-and-update loop in C, feeding OpenSSL's
+    hardware-accelerated SHA path directly without per-chunk Python overhead
+    or materializing the file.
+    """
+    with open(file_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
 
-def get_or_parse_document_text(db: Session, doc: models.Document) -> str:
+def _get_cached_markdown(file_hash: str) -> tuple[str, str | None]:
+    """Returns (cache_key, cached markdown or None) for the given content hash."""
+    cache_key = f"parsed:{file_hash}"
+    try:
+        return cache_key, _redis_client.get(cache_key)
+    except redis.RedisError as e:
+        logger.warning(f"Parsed-markdown cache unavailable ({e}); parsing without cache.")
+        return cache_key, None
+
+def _find_parsed_text_by_hash(db: Session, file_hash: str) -> str | None:
+    """
+    Returns the parsed text of any already-parsed document whose file bytes
+    match the hash. This catches identical files uploaded as *different*
+    Document rows (e.g. the same insurer master policy across patients),
+    which the per-row parsed_text check can't see.
+    """
+    row = db.query(models.Document.parsed_text).filter(
+        models.Document.parsed_text_sha256 == file_hash,
+        models.Document.parsed_text.isnot(None),
+    ).first()
+    return row[0] if row else None
+
+def _store_cached_markdown(cache_key: str, markdown: str):
+    try:
+        _redis_client.setex(cache_key, _PARSED_CACHE_TTL_SECONDS, markdown)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store parsed markdown in cache ({e}).")
+
+async def get_or_parse_document_text(db: Session, doc: models.Document, commit: bool = True) -> str:
     """
     Checks if a document has already been parsed. If so, returns the saved text.
     If not, calls the parsing service, saves the result, and then returns it.
+    Runs inside each task's single orchestration coroutine.
+
+    With commit=False the parsed text is staged on the session but not
+    committed, letting a caller that processes several documents fold the
+    writes into its own single commit. No db.refresh is needed either way:
+    the values just assigned are already the truth.
+
+    The blocking pieces — file hashing, the sync-session queries/commits,
+    and the Redis round-trips — run via asyncio.to_thread so the event loop
+    (and any sibling coroutines on it) stays unblocked.
     """
     if doc.parsed_text:
         logger.info(f"Using cached parsed text for document: {doc.file_name}")
         return doc.parsed_text
-    
+
+    file_hash = await asyncio.to_thread(_file_sha256, doc.file_path)
+
+    # Another Document row may already hold the parsed text for these exact
+    # bytes — copy it instead of paying for another LlamaParse run.
+    reused = await asyncio.to_thread(_find_parsed_text_by_hash, db, file_hash)
+    if reused is not None:
+        logger.info(f"Reusing parsed text from an identical document for: {doc.file_name}")
+        doc.parsed_text = reused
+        doc.parsed_text_sha256 = file_hash
+        db.add(doc)
+        if commit:
+            await asyncio.to_thread(db.commit)
+        return reused
+
+    cache_key, cached = await asyncio.to_thread(_get_cached_markdown, file_hash)
+    if cached is not None:
+        logger.info(f"Parsed-markdown cache hit for document: {doc.file_name}")
+        doc.parsed_text = cached
+        doc.parsed_text_sha256 = file_hash
+        db.add(doc)
+        if commit:
+            await asyncio.to_thread(db.commit)
+        return cached
+
     logger.info(f"No cached text found. Parsing document: {doc.file_name}")
-    parsed_text = run_async(parsing_service.parse_document_async(doc.file_path))
-    
+    parsed_text = await parsing_service.parse_document_async(doc.file_path)
+    await asyncio.to_thread(_store_cached_markdown, cache_key, parsed_text)
+
     # Save the parsed text back to the database for future use
     doc.parsed_text = parsed_text
+    doc.parsed_text_sha256 = file_hash
     db.add(doc)
-    db.commit()
-    db.refresh(doc)
-    
-    # Add a small delay after every parse to respect rate limits
-    time.sleep(1) # Using time.sleep as this part is synchronous within the task
-    
+    if commit:
+        await asyncio.to_thread(db.commit)
+
     return parsed_text
 
+async def parse_documents_concurrently(db: Session, docs: list) -> dict:
+    """
+    Parses every document that has no cached text in one concurrent batch
+    (overlapping the LlamaParse round-trips), saves the results, and returns
+    a {document id: parsed text} map for all docs.
+    """
+    # The cache triage is all blocking work (file hashing, DB lookups, Redis
+    # GETs), so it runs as one batch off the event loop.
+    def _triage() -> list:
+        to_parse = []
+        for doc in docs:
+            if doc.parsed_text:
+                continue
+            file_hash = _file_sha256(doc.file_path)
+            reused = _find_parsed_text_by_hash(db, file_hash)
+            if reused is not None:
+                logger.info(f"Reusing parsed text from an identical document for: {doc.file_name}")
+                doc.parsed_text = reused
+                doc.parsed_text_sha256 = file_hash
+                db.add(doc)
+                continue
+            cache_key, cached = _get_cached_markdown(file_hash)
+            if cached is not None:
+                logger.info(f"Parsed-markdown cache hit for document: {doc.file_name}")
+                doc.parsed_text = cached
+                doc.parsed_text_sha256 = file_hash
+                db.add(doc)
+            else:
+                to_parse.append((doc, cache_key, file_hash))
+        return to_parse
+
+    docs_to_parse = await asyncio.to_thread(_triage)
+
+    if docs_to_parse:
+        logger.info(f"Parsing {len(docs_to_parse)} documents concurrently...")
+
+        # Bound the fan-out so a patient with many documents can't blow
+        # through the LlamaParse rate limit in one burst.
+        sem = asyncio.Semaphore(_PARSE_CONCURRENCY)
+
+        async def _parse(file_path: str) -> str:
+            async with sem:
+                return await parsing_service.parse_document_async(file_path)
+
+        contents = await asyncio.gather(
+            *[_parse(doc.file_path) for doc, _, _ in docs_to_parse]
+        )
+
+        def _store_results():
+            for (doc, cache_key, file_hash), parsed_text in zip(docs_to_parse, contents):
+                doc.parsed_text = parsed_text
+                doc.parsed_text_sha256 = file_hash
+                db.add(doc)
+                _store_cached_markdown(cache_key, parsed_text)
+
+        await asyncio.to_thread(_store_results)
+
+    await asyncio.to_thread(db.commit)
+    return {doc.id: doc.parsed_text for doc in docs}
+
+async def _extract_benefits_from_markdown(markdown_text: str) -> list:
+    """
+    Runs the Benefits Analyst LLM call for one policy document's markdown,
+    going through the exact-match response cache first: the call is
+    deterministic in its inputs (same model, same prompts), so re-ingesting
+    an identical policy document reuses the stored response outright — no
+    embedding step, no token spend, no network round-trip.
+    """
+    system_prompt = _POLICY_SYSTEM_PROMPT
+    user_prompt = f"Here is the policy document text:\n\n{markdown_text}"
+
+    llm_client = llm_service.get_client()
+    if not llm_client:
+        raise ConnectionError("Azure LLM Client is not initialized.")
+
+    model = llm_service.settings.AZURE_LLM_DEPLOYMENT_NAME
+    prompt_hash = hashlib.sha256(
+        orjson.dumps(
+            {"model": model, "system": system_prompt, "user": user_prompt, "tool": _BENEFITS_TOOL},
+            option=orjson.OPT_SORT_KEYS,
+        )
+    ).hexdigest()
+    cache_key = f"llm-exact:policy:{PROMPT_VERSION}:{prompt_hash}"
+    try:
+        response_content = await asyncio.to_thread(_redis_client.get, cache_key)
+    except redis.RedisError as e:
+        logger.warning(f"LLM exact cache unavailable ({e}); calling through.")
+        response_content = None
+
+    cache_hit = response_content is not None
+    if cache_hit:
+        logger.info("LLM exact cache hit for policy extraction.")
+    else:
+        chat_completion = await llm_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
+            tools=[_BENEFITS_TOOL],
+            tool_choice={"type": "function", "function": {"name": "emit_benefits"}},
+            # Stable routing key for Azure's prompt caching: requests sharing
+            # it land on the same backend, so the constant system-prompt
+            # prefix is served from the provider-side KV cache.
+            extra_body={"prompt_cache_key": "policy-analyst-v1"},
+        )
+        # The forced tool call's arguments are the schema-constrained payload.
+        response_content = chat_completion.choices[0].message.tool_calls[0].function.arguments
+
+    benefits = orjson.loads(response_content).get("benefits", [])
+    # Raises pydantic.ValidationError on a malformed response, failing the
+    # task before any benefit rows are written — and before a bad response
+    # gets cached and replayed on every retry.
+    validated = [benefit.model_dump() for benefit in _BENEFITS_VALIDATOR.validate_python(benefits)]
+
+    if not cache_hit:
+        try:
+            await asyncio.to_thread(
+                _redis_client.setex, cache_key, _PARSED_CACHE_TTL_SECONDS, response_content
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Could not store LLM exact cache entry ({e}).")
+
+    return validated
+
+
 # This is our "Policy Genius" task, now fully included.
 @celery_app.task
 def process_policy_document(patient_id_str: str, document_id_str: str):
     """Celery task to process an insurance policy document."""
     logger.info(f"CELERY TASK: Starting Policy Document processing for patient_id: {patient_id_str}")
     db: Session = SessionLocal()
-    patient_id = uuid.UUID(patient_id_str)
-    document_id = uuid.UUID(document_id_str)
     try:
-        policy_document = crud_claim.get_document(db, document_id)
+        policy_document = crud_claim.get_document(db, uuid.UUID(document_id_str))
         if not policy_document:
-            logger.error(f"Policy document {document_id} not found.")
+            logger.error(f"Policy document {document_id_str} not found.")
             return
 
-        markdown_text = get_or_parse_document_text(db, policy_document)
-        
-        system_prompt = """
-        You are an expert Health Insurance Benefits Analyst. Your task is to read the provided policy document text
-        and extract a list of covered benefits. Return a JSON object with a single key "benefits".
-        The "benefits" key should hold an array of objects. Each object represents a single benefit and
-        MUST have these exact keys: 'benefit_type' (e.g., "Office Visit", "Specialist Visit", "Emergency Room"),
-        'is_covered' (boolean), 'co_pay_amount' (number), and 'coverage_percent' (number, e.g., 80 for 80%).
-        If a value isn't specified, use a reasonable default like null or 0.
-        Focus on common medical services.
-        """
-        user_prompt = f"Here is the policy document text:\n\n{markdown_text}"
-
-        if not llm_service.azure_llm_client:
-            raise ConnectionError("Azure LLM Client is not initialized.")
-
-        chat_completion = run_async(llm_service.azure_llm_client.chat.completions.create(
-            model=llm_service.settings.AZURE_LLM_DEPLOYMENT_NAME,
-            messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-            response_format={"type": "json_object"}
-        ))
-        response_content = chat_completion.choices[0].message.content
-        extracted_benefits = json.loads(response_content).get("benefits", [])
-        logger.info(f"Extracted {len(extracted_benefits)} benefits from policy doc {document_id}.")
+        # Single async entry point for the task: parse and LLM call share one
+        # event-loop visit instead of one run_async per awaitable.
+        async def _extract_benefits():
+            markdown_text = await get_or_parse_document_text(db, policy_document)
+            return await _extract_benefits_from_markdown(markdown_text)
 
+        extracted_benefits = run_async(_extract_benefits())
+        logger.info(f"Extracted {len(extracted_benefits)} benefits from policy doc {policy_document.id}.")
+
+        # The loaded row already carries typed UUIDs — no need to re-parse
+        # the string arguments for the downstream CRUD call.
         crud_policy_benefit.create_benefits_for_patient(
-            db=db, patient_id=patient_id, source_document_id=document_id, benefits_data=extracted_benefits
+            db=db, patient_id=policy_document.patient_id,
+            source_document_id=policy_document.id, benefits_data=extracted_benefits
         )
-        logger.info(f"Successfully saved policy benefits for patient {patient_id}.")
+        logger.info(f"Successfully saved policy benefits for patient {policy_document.patient_id}.")
     except Exception as e:
         logger.error(f"Error in Celery task process_policy_document: {e}", exc_info=True)
     finally:
         db.close()
 
 
+@celery_app.task
+def process_policy_documents(doc_specs: list):
+    """
+    Batch variant of process_policy_document for bulk ingestion: one session,
+    one event-loop visit, documents parsed as a concurrent batch and the
+    Benefits Analyst LLM calls fanned out under a semaphore. Amortizes the
+    warm connections and the shared (prompt-cached) system prompt across the
+    whole batch.
+
+    `doc_specs` is a list of (patient_id_str, document_id_str) pairs.
+    """
+    logger.info(f"CELERY TASK: Starting batch policy processing for {len(doc_specs)} documents.")
+    db: Session = SessionLocal()
+    try:
+        docs = []
+        for _, document_id_str in doc_specs:
+            policy_document = crud_claim.get_document(db, uuid.UUID(document_id_str))
+            if not policy_document:
+                logger.error(f"Policy document {document_id_str} not found; skipping.")
+                continue
+            docs.append(policy_document)
+
+        if not docs:
+            return
+
+        async def _extract_all():
+            # Parse first (batch, single commit), then fan out the LLM calls —
+            # they touch no DB state, so they can overlap freely.
+            texts = await parse_documents_concurrently(db, docs)
+
+            sem = asyncio.Semaphore(8)
+
+            async def _one(doc):
+                async with sem:
+                    return await _extract_benefits_from_markdown(texts[doc.id])
+
+            return await asyncio.gather(*[_one(doc) for doc in docs])
+
+        all_benefits = run_async(_extract_all())
+
+        # The loaded rows carry typed UUIDs, so the string patient ids from
+        # doc_specs never need re-parsing.
+        for policy_document, benefits in zip(docs, all_benefits):
+            crud_policy_benefit.create_benefits_for_patient(
+                db=db, patient_id=policy_document.patient_id,
+                source_document_id=policy_document.id, benefits_data=benefits
+            )
+        logger.info(f"Batch policy processing complete for {len(docs)} documents.")
+    except Exception as e:
+        logger.error(f"Error in Celery task process_policy_documents: {e}", exc_info=True)
+    finally:
+        db.close()
+
+
 # --- NEW, POWERFUL CLAIM PROCESSING ORCHESTRATOR ---
 @celery_app.task
 def process_claim_creation(claim_id_str: str):
@@ -104,109 +431,186 @@ def process_claim_creation(claim_id_str: str):
     This is the heart of the hyper-realism pipeline.
     """
     logger.info(f"CELERY TASK: Starting hyper-realistic claim processing for claim_id: {claim_id_str}")
+
+    # Idempotency guard: a duplicate dispatch for the same claim (API retry,
+    # double-click, webhook replay) would run the whole multi-LLM pipeline a
+    # second time and race the first run's DB writes. SET NX acts as a
+    # distributed in-flight lock; the TTL frees it if a worker dies mid-task.
+    lock_key = f"lock:claim:{claim_id_str}"
+    try:
+        if not _redis_client.set(lock_key, "1", nx=True, ex=600):
+            logger.warning(f"Claim {claim_id_str} is already being processed. Skipping duplicate dispatch.")
+            return
+        lock_acquired = True
+    except redis.RedisError as e:
+        logger.warning(f"Claim lock unavailable ({e}); proceeding without idempotency guard.")
+        lock_acquired = False
+
     db: Session = SessionLocal()
     claim_id = uuid.UUID(claim_id_str)
-    
+
     try:
         claim = crud_claim.get_claim(db, claim_id)
         if not claim or not claim.patient:
             logger.error(f"Claim {claim_id} or its patient not found. Aborting task.")
             return
 
-        all_patient_docs = crud_claim.get_all_documents_for_patient(db, claim.patient_id)
+        # get_claim eagerly loads patient.documents, so work from that list
+        # instead of re-querying the documents table.
+        all_patient_docs = claim.patient.documents
         if not all_patient_docs:
             logger.error(f"No documents found for patient {claim.patient_id}. Cannot process claim.")
             crud_claim.update_claim_status(db, claim, ClaimStatus.denied, "No documents found for patient.")
             return
 
-        parsed_docs = {}
+        # De-duplicate before parsing: the same physical file can show up as
+        # multiple document rows (e.g. re-uploaded with a new claim), and
+        # parsing or stitching it twice only duplicates prompt text.
+        seen_ids = set()
+        seen_hashes = set()
+        unique_docs = []
         for doc in all_patient_docs:
-            purpose = doc.document_purpose or 'UNKNOWN'
-            logger.info(f"Parsing document '{purpose}': {doc.file_name}")
-            content = get_or_parse_document_text(db, doc)
-            
-            if purpose in parsed_docs:
-                parsed_docs[purpose] += f"\n\n--- (Additional Document: {doc.file_name}) ---\n\n" + content
-            else:
-                parsed_docs[purpose] = content
-            
-            time.sleep(1)
-
-        policy_doc = crud_claim.find_document_by_purpose(db, patient_id=claim.patient_id, purpose='POLICY_DOC')
-        if policy_doc:
-            logger.info(f"Parsing associated policy document: {policy_doc.file_name}")
-            parsed_docs['POLICY_DOC'] = get_or_parse_document_text(db, policy_doc)
-        else:
-            logger.warning(f"No POLICY_DOC found for patient {claim.patient_id}. Proceeding without it, but results may be less accurate.")
-
-        # --- THE FIX STARTS HERE ---
-        # 1. AI STEP 1: SYNTHESIZE & EXTRACT
-        extracted_claim_data = run_async(llm_service.synthesize_and_extract_claim_data(parsed_docs))
-        logger.info("AI Step 1 (Synthesize & Extract) complete.")
-        
-        # Initialize our update object with the extracted data
-        update_data = schemas.ClaimUpdate(**extracted_claim_data)
-
-        # 2. AI STEP 2: CODING (RAG METHOD)
-        encounter_note_text = parsed_docs.get('ENCOUNTER_NOTE', '')
-        if not encounter_note_text:
-             logger.warning(f"No ENCOUNTER_NOTE found for claim {claim_id}. Coding accuracy will be severely impacted.")
-
-        coding_suggestions = run_async(llm_service.generate_medical_codes(encounter_note_text, extracted_claim_data))
-        icd10_search_terms = coding_suggestions.get("icd10_search_terms", [])
-        retrieved_icd10_candidates = crud_medical_code.find_similar_icd10_codes(db, icd10_search_terms)
-        final_icd10_codes = run_async(llm_service.select_final_icd10_codes(encounter_note_text, retrieved_icd10_candidates))
-        
-        initial_codes_for_validation = {
-            "suggested_cpt_codes": coding_suggestions.get("suggested_cpt_codes", []),
-            "suggested_icd10_codes": final_icd10_codes
-        }
-        validated_codes = crud_medical_code.validate_codes(db, initial_codes_for_validation)
-        logger.info(f"AI Step 2 (Coding) complete. Validated codes: {validated_codes}")
-
-        # 3. AI STEP 3: ELIGIBILITY, COMPLIANCE & MODIFIER APPLICATION
-        cpt_code_strings = [item['code'] for item in validated_codes.get('cpt_codes', [])]
-        eligibility_status, patient_resp = crud_policy_benefit.check_claim_eligibility(
-            db=db, patient_id=claim.patient_id, service_codes=cpt_code_strings
+            if doc.id in seen_ids:
+                continue
+            seen_ids.add(doc.id)
+            try:
+                file_hash = _file_sha256(doc.file_path)
+            except OSError:
+                file_hash = None
+            if file_hash is not None:
+                if file_hash in seen_hashes:
+                    logger.info(f"Skipping duplicate document content: {doc.file_name}")
+                    continue
+                seen_hashes.add(file_hash)
+            unique_docs.append(doc)
+
+        # --- THE AI ASSEMBLY LINE, AS ONE ASYNC PIPELINE ---
+        # Parsing and every LLM step run inside a single coroutine (one event
+        # loop entry for the whole task). Independent stages — the eligibility
+        # DB lookup and the compliance LLM call — are overlapped with
+        # asyncio.gather; sync DB work inside the pipeline is pushed to a
+        # worker thread so it doesn't block the loop.
+        async def _ai_pipeline():
+            # 0. PARSE: everything that needs it, in one concurrent batch,
+            # then stitch the per-purpose texts together.
+            parsed_text_by_id = await parse_documents_concurrently(db, unique_docs)
+
+            # Collect segments per purpose and join once at the end: repeated
+            # += on large document strings re-copies the accumulated text for
+            # every additional file, which adds up for patients with many
+            # encounter notes.
+            doc_segments: dict = {}
+            for doc in unique_docs:
+                purpose = doc.document_purpose or 'UNKNOWN'
+                content = parsed_text_by_id[doc.id]
+
+                segments = doc_segments.setdefault(purpose, [])
+                if segments:
+                    segments.append(f"\n\n--- (Additional Document: {doc.file_name}) ---\n\n")
+                segments.append(content)
+
+            parsed_docs = {purpose: "".join(segments) for purpose, segments in doc_segments.items()}
+
+            if 'POLICY_DOC' not in parsed_docs:
+                # The eager-loaded list already covers the patient's documents;
+                # no need for another purpose-filtered query.
+                policy_doc = next(
+                    (d for d in all_patient_docs if d.document_purpose == 'POLICY_DOC'), None
+                )
+                if policy_doc:
+                    logger.info(f"Parsing associated policy document: {policy_doc.file_name}")
+                    # Staged only: the task's final claim update commits the
+                    # session, which persists this alongside everything else.
+                    parsed_docs['POLICY_DOC'] = await get_or_parse_document_text(db, policy_doc, commit=False)
+                else:
+                    logger.warning(f"No POLICY_DOC found for patient {claim.patient_id}. Proceeding without it, but results may be less accurate.")
+
+            # 1. AI STEP 1: SYNTHESIZE & EXTRACT
+            extracted_claim_data = await llm_service.synthesize_and_extract_claim_data(parsed_docs)
+            logger.info("AI Step 1 (Synthesize & Extract) complete.")
+
+            encounter_note_text = parsed_docs.get('ENCOUNTER_NOTE', '')
+            if not encounter_note_text:
+                logger.warning(f"No ENCOUNTER_NOTE found for claim {claim_id}. Coding accuracy will be severely impacted.")
+
+            # 2. AI STEP 2: CODING (RAG METHOD)
+            coding_suggestions = await llm_service.generate_medical_codes(encounter_note_text, extracted_claim_data)
+            icd10_search_terms = coding_suggestions.get("icd10_search_terms", [])
+            retrieved_icd10_candidates = await asyncio.to_thread(
+                crud_medical_code.find_similar_icd10_codes, db, icd10_search_terms
+            )
+            # The CPT suggestions don't depend on the ICD-10 selection, so
+            # validate them against the DB while the selection LLM call is
+            # still in flight, then validate the selected ICD-10 codes.
+            final_icd10_codes, cpt_validated = await asyncio.gather(
+                llm_service.select_final_icd10_codes(encounter_note_text, retrieved_icd10_candidates),
+                asyncio.to_thread(
+                    crud_medical_code.validate_codes, db,
+                    {"suggested_cpt_codes": coding_suggestions.get("suggested_cpt_codes", []),
+                     "suggested_icd10_codes": []}
+                ),
+            )
+            icd10_validated = await asyncio.to_thread(
+                crud_medical_code.validate_codes, db,
+                {"suggested_cpt_codes": [], "suggested_icd10_codes": final_icd10_codes}
+            )
+            validated_codes = {
+                "cpt_codes": cpt_validated["cpt_codes"],
+                "icd10_codes": icd10_validated["icd10_codes"],
+            }
+            logger.info(f"AI Step 2 (Coding) complete. Validated codes: {validated_codes}")
+
+            # 3. AI STEP 3: ELIGIBILITY, COMPLIANCE & MODIFIER APPLICATION
+            # Eligibility (DB) runs while the single compliance LLM call is
+            # in flight; the compliance prompt now emits the modifier-applied
+            # CPT codes in the same completion, so the old dedicated modifier
+            # call (one extra network+queue round trip per claim) is gone. A
+            # TaskGroup also cancels the in-flight sibling if one branch
+            # fails, instead of letting it run to completion.
+            cpt_code_strings = [item['code'] for item in validated_codes.get('cpt_codes', [])]
+            async with asyncio.TaskGroup() as tg:
+                eligibility_task = tg.create_task(asyncio.to_thread(
+                    crud_policy_benefit.check_claim_eligibility,
+                    db=db, patient_id=claim.patient_id, service_codes=cpt_code_strings
+                ))
+                compliance_and_confidence = await llm_service.check_compliance_and_refine(
+                    encounter_note_text, extracted_claim_data, validated_codes,
+                    cpt_codes=cpt_code_strings
+                )
+                modified_cpt_codes = compliance_and_confidence.get("modified_cpt_codes", cpt_code_strings)
+                logger.info(f"AI Step 3b (Compliance + Modifier) complete. Final CPT codes: {modified_cpt_codes}")
+
+            eligibility_status, patient_resp = eligibility_task.result()
+            logger.info(f"AI Step 3a (Eligibility) complete. Status: {eligibility_status}")
+
+            for i, item in enumerate(validated_codes['cpt_codes']):
+                if i < len(modified_cpt_codes):
+                    item['code'] = modified_cpt_codes[i]
+
+            return (extracted_claim_data, validated_codes, eligibility_status,
+                    patient_resp, compliance_and_confidence)
+
+        (extracted_claim_data, validated_codes, eligibility_status,
+         patient_resp, compliance_and_confidence) = run_async(_ai_pipeline())
+
+        # Assemble the complete update object from the pipeline results.
+        update_data = schemas.ClaimUpdate(
+            **{k: v for k, v in extracted_claim_data.items() if k in _CLAIM_UPDATE_FIELDS}
         )
-        logger.info(f"AI Step 3a (Eligibility) complete. Status: {eligibility_status}")
-        
-        # Add eligibility results to our update object
         update_data.eligibility_status = eligibility_status
         update_data.patient_responsibility_amount = patient_resp
-
-        compliance_and_confidence = run_async(llm_service.check_compliance_and_refine(
-            encounter_note_text, extracted_claim_data, validated_codes
-        ))
-        logger.info("AI Step 3b (Compliance) complete.")
-        
-        # Add compliance flags to our update object
         update_data.compliance_flags = compliance_and_confidence.get("compliance_flags", [])
 
-        modified_cpt_codes = run_async(llm_service.apply_modifiers(
-            cpt_codes=cpt_code_strings,
-            compliance_flags=compliance_and_confidence.get("compliance_flags", [])
-        ))
-        logger.info(f"AI Step 3c (Modifier) complete. Final CPT codes: {modified_cpt_codes}")
-        
-        for i, item in enumerate(validated_codes['cpt_codes']):
-            if i < len(modified_cpt_codes):
-                item['code'] = modified_cpt_codes[i]
-
         # 4. FINAL STEP: UPDATE DATABASE
-        # We now have a single, complete update_data object.
-        # We use the same CRUD function that the manual edit uses.
-        crud_claim.update_claim(db=db, claim_id=claim.id, claim_in=update_data)
-        
-        # Create the service lines separately as before
-        crud_claim.create_service_lines_for_claim(
-            db=db, claim_id=claim.id, validated_codes=validated_codes,
+        # One transaction for the whole result: field updates, service-line
+        # replacement, and the status flip to draft all commit together on
+        # the claim instance we already hold.
+        crud_claim.finalize_claim_processing(
+            db=db, claim=claim, claim_in=update_data, validated_codes=validated_codes,
             confidence_scores=compliance_and_confidence.get("confidence_scores", {}),
             diagnosis_pointers=compliance_and_confidence.get("diagnosis_pointers", {}),
             extracted_claim_data=extracted_claim_data
         )
-        
-        crud_claim.update_claim_status(db, claim=claim, status=ClaimStatus.draft)
         logger.info(f"Successfully processed and updated claim {claim_id}. Status set to 'draft'.")
 
     except Exception as e:
@@ -214,9 +618,49 @@ def process_claim_creation(claim_id_str: str):
         if 'claim' in locals() and claim:
             crud_claim.update_claim_status(db, claim, ClaimStatus.denied, f"Internal Processing Error: {str(e)}")
     finally:
+        if lock_acquired:
+            try:
+                _redis_client.delete(lock_key)
+            except redis.RedisError:
+                pass  # TTL will reap it
         db.close()
 
 
+def _claim_to_adjudication_payload(claim: models.Claim) -> dict:
+    """
+    Builds the claim dict the adjudicator prompt actually needs, straight
+    from the ORM instance. Cheaper than a full schemas.Claim validation pass,
+    which validates and deep-copies every column and nested object just to
+    produce prompt text.
+    """
+    def _num(value):
+        return float(value) if value is not None else None
+
+    patient = claim.patient
+    return {
+        "claim_id": str(claim.id),
+        "patient_name": f"{patient.first_name} {patient.last_name}" if patient else None,
+        "payer_name": claim.payer_name,
+        "insured_id_number": claim.insured_id_number,
+        "prior_authorization_number": claim.prior_authorization_number,
+        "date_of_service": claim.date_of_service.isoformat() if claim.date_of_service else None,
+        "total_charge_amount": _num(claim.total_charge_amount),
+        "eligibility_status": claim.eligibility_status,
+        "patient_responsibility_amount": _num(claim.patient_responsibility_amount),
+        "compliance_flags": claim.compliance_flags,
+        "service_lines": [
+            {
+                "cpt_code": line.cpt_code,
+                "icd10_codes": line.icd10_codes,
+                "modifiers": line.modifiers,
+                "units": line.units,
+                "charge": _num(line.charge),
+                "diagnosis_pointer": line.diagnosis_pointer,
+            }
+            for line in claim.service_lines
+        ],
+    }
+
 # --- NEW: Adjudication Task ---
 @celery_app.task
 def process_adjudication(claim_id_str: str):
@@ -237,17 +681,25 @@ def process_adjudication(claim_id_str: str):
             logger.error(f"No policy document found for patient {claim.patient_id}, cannot adjudicate.")
             return
         
-        policy_text = get_or_parse_document_text(db, policy_doc)
-        
-        claim_dict = schemas.Claim.from_orm(claim).model_dump()
-        
-        # --- THE FIX: Make ONE call to our powerful adjudicator AI ---
-        adjudication_result = run_async(llm_service.adjudicate_claim_as_payer(claim_dict, policy_text))
+        # Build the prompt payload directly from the ORM instance: only the
+        # fields the adjudicator actually reads, skipping the full Pydantic
+        # validation walk over every column and nested object.
+        claim_json = orjson.dumps(
+            _claim_to_adjudication_payload(claim), option=orjson.OPT_INDENT_2
+        ).decode()
+
+        # Single async entry point: parse the policy and make ONE call to
+        # our powerful adjudicator AI, all in one event-loop visit.
+        async def _adjudicate():
+            policy_text = await get_or_parse_document_text(db, policy_doc)
+            return await llm_service.adjudicate_claim_as_payer(claim_json, policy_text)
+
+        adjudication_result = run_async(_adjudicate())
         logger.info(f"AI Adjudicator result: {adjudication_result}")
 
         decision = adjudication_result.get("decision")
         
-        update_data = { "adjudication_date": datetime.utcnow() }
+        update_data = { "adjudication_date": datetime.now(timezone.utc) }
 
         if decision == "approved":
             update_data["status"] = ClaimStatus.approved
@@ -291,42 +743,31 @@ def process_meriplex_document(document_id_str: str):
         db_doc.status = MeriplexDocumentStatus.PROCESSING
         db.commit()
 
-        markdown_content = run_async(mistral_service.ocr_document_async(db_doc.file_path))
-        if not markdown_content:
-            raise ValueError("OCR process returned no content.")
+        # Single async entry point: OCR, then classification and extraction
+        # fan out concurrently inside the orchestrator.
+        async def _ocr_and_process():
+            markdown = await mistral_service.ocr_document_async(db_doc.file_path)
+            if not markdown:
+                raise ValueError("OCR process returned no content.")
+            return markdown, await openai_service.process_document(markdown)
 
-        classification_result = run_async(openai_service.classify_document(markdown_content))
-        classification_str = classification_result.get("classification", "UNCLASSIFIED")
+        markdown_content, pipeline_result = run_async(_ocr_and_process())
+        classification_str = pipeline_result.pop("classification", "UNCLASSIFIED")
         classification_enum = MeriplexDocumentClassification[classification_str]
-        
+
         db_doc.classification = classification_enum
         db.commit()
         db.refresh(db_doc)
         logger.info(f"Document {document_id} classified as: {classification_enum.name}")
 
-        final_data_to_store = {"raw_text": markdown_content}
-
-        if classification_enum == MeriplexDocumentClassification.REFERRAL_FAX:
-            extracted_data = run_async(openai_service.extract_referral_data(markdown_content))
-            final_data_to_store['extracted_referral'] = extracted_data
-        
-        elif classification_enum == MeriplexDocumentClassification.DICTATED_NOTE:
-            granular_note_data = run_async(openai_service.extract_dictated_note_data(markdown_content))
-            final_data_to_store['extracted_note'] = granular_note_data
-            
-            suggested_actions = run_async(openai_service.generate_emr_actions(granular_note_data))
-            final_data_to_store['suggested_actions'] = suggested_actions.get('suggested_actions', [])
+        final_data_to_store = {"raw_text": markdown_content, **pipeline_result}
 
-        # --- NEW LOGIC FOR MODMED NOTES ---
-        elif classification_enum == MeriplexDocumentClassification.MODMED_NOTE:
-            exhaustive_data = run_async(openai_service.extract_modmed_note_data(markdown_content))
-            final_data_to_store['extracted_modmed_note'] = exhaustive_data
+        if classification_enum == MeriplexDocumentClassification.MODMED_NOTE:
             logger.info(f"Generating embedding for ModMed note: {db_doc.id}")
             embedding = get_embeddings([markdown_content])
             if embedding and embedding[0]:
                 db_doc.vector = embedding[0]
 
-        
         db_doc.extracted_data = final_data_to_store
         db_doc.status = MeriplexDocumentStatus.COMPLETED
         db.commit()
@@ -1,10 +1,15 @@
 import os
+import shutil
 from pathlib import Path
 from fastapi import UploadFile
 
 UPLOAD_DIRECTORY = "./uploads"
 Path(UPLOAD_DIRECTORY).mkdir(parents=True, exist_ok=True)
 
+# Copy uploads in 1MB chunks so peak memory stays flat regardless of file
+# size, instead of buffering the whole upload before the first write.
+_COPY_CHUNK_SIZE = 1 << 20
+
 def save_upload_file(upload_file: UploadFile) -> str:
     """
     Saves an uploaded file to the UPLOAD_DIRECTORY and returns the full path.
@@ -14,10 +19,10 @@ def save_upload_file(upload_file: UploadFile) -> str:
     filename = Path(upload_file.filename).name
     if not filename:
         raise ValueError("Filename cannot be empty.")
-        
+
     file_path = os.path.join(UPLOAD_DIRECTORY, filename)
-    
+
     with open(file_path, "wb") as buffer:
-        buffer.write(upload_file.file.read())
-        
+        shutil.copyfileobj(upload_file.file, buffer, length=_COPY_CHUNK_SIZE)
+
     return file_path
\ No newline at end of file
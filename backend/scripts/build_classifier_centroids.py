@@ -0,0 +1,72 @@
+import sys
+import os
+import logging
+import numpy as np
+
+# --- Setup Logging & Path ---
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_root)
+
+from openai import OpenAI
+from app.core.config import settings
+
+# Must match CLASSIFIER_EMBEDDING_MODEL / CLASSIFICATION_LABELS in openai_service.py
+EMBEDDING_MODEL = "text-embedding-3-small"
+OUTPUT_PATH = os.path.join(project_root, "classifier_centroids.npy")
+
+# Exemplar snippets per category. Add more real-world snippets over time to
+# tighten the centroids; the runtime classifier only falls back to the LLM
+# when the nearest centroid is below its confidence threshold.
+EXEMPLARS = {
+    "REFERRAL_FAX": [
+        "REFERRAL ORDER\nTo: OrthoSouth\nFrom: Memphis Family Practice\nReason for Referral: Evaluation of chronic right knee pain. New Patient Visit requested.",
+        "FAX COVER SHEET - Referral\nPatient is being referred for orthopedic consultation. Please schedule a new patient visit at your earliest convenience.",
+        "Referral Authorization - TRICARE\nReferred to: Orthopedic Surgery. Reason for Referral: lumbar radiculopathy, failed conservative management.",
+        "URGENT REFERRAL\nReferring Provider: Dr. Smith. Patient requires specialist evaluation for rotator cuff tear. Insurance: CIGNA, Member ID enclosed.",
+    ],
+    "MODMED_NOTE": [
+        "OrthoSouth\nPatient: DOE, JANE  MRN: 123456  PMS ID: 78910  DOB: 1961-03-02\nAllergies: NKDA\nMedications: Lisinopril\nVitals: Height 5'6\" Weight 170 lb BMI 27.4\nImpression/Plan: Lumbar spondylosis.",
+        "Visit Note - EMA\nPatient Demographics\nMRN: 445566\nAllergies\nMedications\nVitals\nPhysical Exam\nImpression/Plan\nFollow-up: 4 weeks",
+        "OrthoSouth EMR\nChief Complaint: low back pain\nAllergies: Penicillin\nMedications: Meloxicam 15mg\nX-Ray Interpretation Lumbar Spine: degenerative disc disease\nImpression and Plan: Home Exercise Program, Counseling.",
+    ],
+    "DICTATED_NOTE": [
+        "HISTORY OF PRESENT ILLNESS: The patient is a pleasant 58-year-old who presents with several months of progressive left shoulder pain. PHYSICAL EXAMINATION: ... ASSESSMENT AND PLAN: 1. Left shoulder impingement.",
+        "The patient returns today for follow-up of right knee osteoarthritis. HISTORY OF PRESENT ILLNESS: Symptoms have improved with physical therapy. ASSESSMENT AND PLAN: Continue home exercise program, follow up in six weeks.",
+        "CHIEF COMPLAINT: Low back pain. HISTORY OF PRESENT ILLNESS: The patient reports gradual onset of axial low back pain without radicular symptoms. ASSESSMENT AND PLAN: MRI of the lumbar spine is ordered.",
+    ],
+    "NON_REFERRAL": [
+        "AUTHORIZATION NOTICE\nThe following service has been Approved: MRI Lower Extremity. This notice is for your records. No action is required.",
+        "FAX TRANSMITTAL FORM\nRE: Medical Clearance for upcoming procedure. Patient is cleared for surgery from a cardiac standpoint. EKG Result attached.",
+        "LAB RESULTS\nPatient: DOE, JOHN\nCBC within normal limits. Results faxed for your records.",
+    ],
+}
+
+# Must match the label order expected by openai_service.CLASSIFICATION_LABELS
+LABEL_ORDER = ["REFERRAL_FAX", "MODMED_NOTE", "DICTATED_NOTE", "NON_REFERRAL"]
+
+
+def main():
+    if not settings.OPENAI_API_KEY:
+        logging.error("OPENAI_API_KEY is not configured. Cannot build centroids.")
+        sys.exit(1)
+
+    client = OpenAI(api_key=settings.OPENAI_API_KEY)
+    centroids = []
+
+    for label in LABEL_ORDER:
+        snippets = EXEMPLARS[label]
+        logging.info(f"Embedding {len(snippets)} exemplars for '{label}'...")
+        response = client.embeddings.create(model=EMBEDDING_MODEL, input=snippets)
+        vectors = np.array([item.embedding for item in response.data])
+        # Normalize each exemplar before averaging so long snippets don't dominate.
+        vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        centroids.append(vectors.mean(axis=0))
+
+    centroid_matrix = np.array(centroids)
+    np.save(OUTPUT_PATH, centroid_matrix)
+    logging.info(f"Saved centroid matrix {centroid_matrix.shape} to {OUTPUT_PATH}.")
+
+
+if __name__ == "__main__":
+    main()
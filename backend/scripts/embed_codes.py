@@ -1,8 +1,9 @@
+import asyncio
 import sys
 import os
 import logging
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, update
 
 # --- Setup Logging & Path ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -11,10 +12,25 @@ sys.path.append(project_root)
 
 from app.core.config import settings
 from app.models.medical_code import MedicalCode
-from app.services.embedding_service import get_embeddings
+from app.services.embedding_service import get_embeddings_async
 
 # --- Configuration ---
 BATCH_SIZE = 100 # Process 100 codes at a time
+EMBED_CONCURRENCY = 10 # How many embedding batches may be in flight at once
+
+
+async def _embed_batches(description_batches):
+    """
+    Embeds all batches concurrently, bounded by a semaphore so we overlap the
+    HTTP round-trips without blowing past the provider's rate limits.
+    """
+    sem = asyncio.Semaphore(EMBED_CONCURRENCY)
+
+    async def _embed(descriptions):
+        async with sem:
+            return await get_embeddings_async(descriptions)
+
+    return await asyncio.gather(*[_embed(batch) for batch in description_batches])
 
 def main():
     logging.info("Starting database vectorization process...")
@@ -23,35 +39,60 @@ def main():
     db = SessionLocal()
 
     try:
-        codes_to_process = db.query(MedicalCode).filter(MedicalCode.vector == None).all()
-        total_codes = len(codes_to_process)
+        # Only the id and description are needed: plain tuples instead of
+        # full ORM objects, and the vectors go back via a bulk UPDATE below.
+        rows = db.query(MedicalCode.id, MedicalCode.description).filter(
+            MedicalCode.vector == None
+        ).all()
+        total_codes = len(rows)
         logging.info(f"Found {total_codes} medical codes to vectorize.")
 
         if total_codes == 0:
             logging.info("No new codes to vectorize. Exiting.")
             return
 
-        for i in range(0, total_codes, BATCH_SIZE):
-            batch = codes_to_process[i:i + BATCH_SIZE]
-            # Filter out any descriptions that are empty or just whitespace
-            valid_descriptions = [code.description for code in batch if code.description and code.description.strip()]
-            
-            if not valid_descriptions:
-                logging.warning(f"Skipping batch {i//BATCH_SIZE + 1} as it contains no valid descriptions.")
-                continue
-
-            logging.info(f"Processing batch {i//BATCH_SIZE + 1}/{(total_codes + BATCH_SIZE - 1)//BATCH_SIZE}...")
-            
-            embeddings = get_embeddings(valid_descriptions)
-            
-            # Map embeddings back to the correct codes
-            desc_to_code_map = {code.description: code for code in batch if code.description and code.description.strip()}
-            for desc, vector in zip(valid_descriptions, embeddings):
+        # Dedupe before embedding: ICD-10 variant codes and CPT modifiers
+        # frequently share the exact same description, so each unique string
+        # is embedded once and the vector is fanned back out to every row
+        # that carries it. dict.fromkeys keeps first-seen order.
+        unique_descriptions = list(dict.fromkeys(
+            row.description.strip()
+            for row in rows
+            if row.description and row.description.strip()
+        ))
+        logging.info(
+            f"{len(unique_descriptions)} unique descriptions across {total_codes} codes."
+        )
+
+        # Batch the unique strings and embed every batch concurrently:
+        # wall-clock time becomes roughly total/concurrency round-trips
+        # instead of one sequential round-trip per batch.
+        description_batches = [
+            unique_descriptions[i:i + BATCH_SIZE]
+            for i in range(0, len(unique_descriptions), BATCH_SIZE)
+        ]
+        logging.info(f"Embedding {len(description_batches)} batches with concurrency {EMBED_CONCURRENCY}...")
+        all_embeddings = asyncio.run(_embed_batches(description_batches))
+
+        vec_by_desc = {}
+        for batch, embeddings in zip(description_batches, all_embeddings):
+            for description, vector in zip(batch, embeddings):
                 if vector:
-                    desc_to_code_map[desc].vector = vector
-            
-            db.commit()
-            logging.info(f"Committed vectors for {len(valid_descriptions)} codes.")
+                    vec_by_desc[description] = vector
+
+        updates = []
+        for row in rows:
+            description = row.description.strip() if row.description else ""
+            vector = vec_by_desc.get(description)
+            if vector:
+                updates.append({"id": row.id, "vector": vector})
+
+        # One executemany UPDATE-by-primary-key for the whole run instead of
+        # per-object attribute sets, which would emit an UPDATE per row.
+        if updates:
+            db.execute(update(MedicalCode), updates)
+        db.commit()
+        logging.info(f"Committed vectors for {len(updates)} codes.")
 
         logging.info("--- Vectorization Complete ---")
 
@@ -62,4 +103,4 @@ def main():
         db.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
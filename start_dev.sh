@@ -41,7 +41,7 @@ BACKEND_PID=$!
 
 # 4. Start Celery Worker
 echo "Starting Celery worker..."
-(cd backend && source venv/bin/activate && celery -A app.celery_worker worker --loglevel=info) &
+(cd backend && source venv/bin/activate && celery -A app.celery_worker worker --loglevel=info -P threads -c 50 -Q celery,claims,ocr) &
 CELERY_PID=$!
 
 echo "All services are running."